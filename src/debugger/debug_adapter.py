@@ -3,15 +3,27 @@
 Implements the Debug Adapter Protocol for VSCode integration.
 """
 
+import io
 import json
+import logging
+import re
 import sys
-import threading
 import asyncio
+from functools import lru_cache
 from typing import Dict, List, Optional, Any, Union
 from pathlib import Path
 
 from ..vm.virtual_machine import VirtualMachine, create_vm
-from ..vm.cpu import CPUState
+from ..vm.cpu import STATE_RUNNING, STATE_ERROR, STATE_BREAKPOINT
+
+
+logger = logging.getLogger(__name__)
+
+# Evaluatable expressions: register (r0, R12) or memory address (0x1F00)
+_RE_EXPR = re.compile(r'^[rR](\d+)$|^0x([0-9a-fA-F]+)$')
+
+# Display format for register/memory values: hex and decimal
+_VALUE_FORMAT = '0x%08X (%d)'
 
 
 class DebugAdapterError(Exception):
@@ -45,6 +57,9 @@ class DebugMessage:
 class MCLDebugAdapter:
     """Debug Adapter for MCL language."""
     
+    # Maximum bytes taken from the input stream per read
+    READ_CHUNK_SIZE = 65536
+    
     def __init__(self, input_stream=None, output_stream=None):
         """Initialize debug adapter.
         
@@ -60,10 +75,16 @@ class MCLDebugAdapter:
         self.sequence = 0
         self.client_seq = 0
         self.running = False
+        self._rxbuf = bytearray()
+        self._txbuf: List[bytes] = []
+        self._vm_task: Optional[asyncio.Future] = None
+        # Evaluate results, cached per adapter so clearing the cache only
+        # affects this adapter and it does not outlive the adapter
+        self._evaluate = lru_cache(maxsize=64)(self._evaluate_expression)
         
         # Source mapping
         self.source_file: Optional[str] = None
-        self.source_lines: List[str] = []
+        self._source_obj: Dict[str, Any] = {'name': 'program', 'path': None}
         
         # Request handlers
         self.request_handlers = {
@@ -85,59 +106,130 @@ class MCLDebugAdapter:
     
     def run(self) -> None:
         """Start the debug adapter."""
+        asyncio.run(self.run_async())
+    
+    async def run_async(self) -> None:
+        """Run the debug adapter on an asyncio event loop."""
         self.running = True
         
         try:
             while self.running:
-                message = self._read_message()
-                if message:
+                messages = await self._read_all_pending()
+                if messages is None:
+                    # Client closed the stream
+                    break
+                for message in messages:
                     self._handle_message(message)
+                # One write for every response/event produced by the batch
+                await self._flush()
         except Exception as e:
             self._send_error_response(0, str(e))
+            await self._flush()
         finally:
             if self.vm:
                 self.vm.shutdown()
     
-    def _read_message(self) -> Optional[Dict[str, Any]]:
-        """Read a message from the input stream."""
-        try:
-            # Read Content-Length header
-            while True:
-                line = self.input_stream.readline()
-                if not line:
-                    return None
-                
-                line = line.strip()
-                if line.startswith('Content-Length:'):
-                    length = int(line.split(':')[1].strip())
-                    break
-                elif line == '':
-                    # Empty line, look for content length in next lines
-                    continue
+    async def _read_all_pending(self) -> Optional[List[Dict[str, Any]]]:
+        """Read available input and return every complete message in it.
+        
+        The input stream is read in an executor thread, so any file-like
+        object works (pipes, console stdin, regular files, BytesIO).
+        
+        Returns:
+            List of decoded messages, or None once the input stream is closed
+        """
+        while True:
+            messages = self._parse_messages()
+            if messages:
+                return messages
             
-            # Read empty line
-            self.input_stream.readline()
+            chunk = await asyncio.get_running_loop().run_in_executor(
+                None, self._read_chunk)
+            if not chunk:
+                return None
+            self._rxbuf += chunk
+    
+    def _read_chunk(self) -> bytes:
+        """Blocking read of the next chunk of input."""
+        stream = getattr(self.input_stream, 'buffer', self.input_stream)
+        # read1 returns what is available instead of waiting for a full chunk
+        read = getattr(stream, 'read1', stream.read)
+        chunk = read(self.READ_CHUNK_SIZE)
+        if isinstance(chunk, str):
+            chunk = chunk.encode('utf-8')
+        return chunk
+    
+    def _parse_messages(self) -> List[Dict[str, Any]]:
+        """Remove and decode all complete messages from the receive buffer."""
+        messages = []
+        buf = self._rxbuf
+        pos = 0
+        
+        while True:
+            header_end = buf.find(b'\r\n\r\n', pos)
+            if header_end < 0:
+                break
+            
+            length = None
+            for line in bytes(buf[pos:header_end]).split(b'\r\n'):
+                if line.startswith(b'Content-Length:'):
+                    try:
+                        length = int(line.split(b':')[1].strip())
+                    except ValueError:
+                        pass
             
-            # Read message body
-            content = self.input_stream.read(length)
-            return json.loads(content)
+            body_start = header_end + 4
+            if length is None:
+                # Malformed header - skip it
+                pos = body_start
+                continue
             
-        except (json.JSONDecodeError, ValueError, IOError):
-            return None
+            if len(buf) - body_start < length:
+                # Body not fully received yet
+                break
+            
+            try:
+                messages.append(json.loads(buf[body_start:body_start + length]))
+            except (json.JSONDecodeError, ValueError):
+                pass
+            pos = body_start + length
+        
+        del buf[:pos]
+        return messages
     
     def _send_message(self, message: Dict[str, Any]) -> None:
-        """Send a message to the output stream."""
+        """Queue a message for the output stream (written by _flush)."""
+        content = json.dumps(message).encode('utf-8')
+        self._txbuf.append(f"Content-Length: {len(content)}\r\n\r\n".encode('ascii'))
+        self._txbuf.append(content)
+    
+    async def _flush(self) -> None:
+        """Write all queued messages to the output stream at once."""
+        self._flush_now()
+    
+    def _flush_now(self) -> None:
+        """Write all queued messages without waiting on the event loop."""
+        if not self._txbuf:
+            return
+        
+        data = b''.join(self._txbuf)
+        self._txbuf.clear()
         try:
-            content = json.dumps(message)
-            header = f"Content-Length: {len(content)}\r\n\r\n"
-            
-            self.output_stream.write(header)
-            self.output_stream.write(content)
-            self.output_stream.flush()
-            
-        except IOError:
+            # Written inline so concurrent flushes cannot reorder messages
+            self._write(data)
+        except (IOError, ConnectionError):
             pass
     
+    def _write(self, data: bytes) -> None:
+        """Write data to the output stream and flush it."""
+        stream = getattr(self.output_stream, 'buffer', None)
+        if stream is None:
+            stream = self.output_stream
+            if isinstance(stream, io.TextIOBase):
+                data = data.decode('utf-8')
+        stream.write(data)
+        stream.flush()
+    
     def _send_response(self, request_seq: int, command: str, success: bool = True, 
                       message: str = None, body: Dict[str, Any] = None) -> None:
         """Send a response message."""
@@ -237,15 +329,15 @@ class MCLDebugAdapter:
             
             # Create VM and load program
             self.vm = create_vm()
+            self._evaluate.cache_clear()
             self.vm.load_program(program)
             
-            # Load source file for debugging
+            # Remember the source file
             self.source_file = program
-            try:
-                with open(program, 'r') as f:
-                    self.source_lines = f.readlines()
-            except IOError:
-                self.source_lines = []
+            self._source_obj = {
+                'name': Path(program).name,
+                'path': program
+            }
             
             self._send_response(seq, 'launch', True)
             
@@ -301,36 +393,52 @@ class MCLDebugAdapter:
             self._send_error_response(seq, "No program loaded")
             return
         
-        # Start execution in a separate thread
-        def run_vm():
-            self.vm.start()
-            
-            # Wait for execution to stop
-            while self.vm.running and not self.vm.paused:
-                if self.vm.cpu.state == CPUState.BREAKPOINT:
-                    self._send_event('stopped', {
-                        'reason': 'breakpoint',
-                        'threadId': 1
-                    })
-                    return
-                elif self.vm.cpu.state != CPUState.RUNNING:
-                    reason = 'exception' if self.vm.cpu.state == CPUState.ERROR else 'exit'
-                    self._send_event('stopped', {
-                        'reason': reason,
-                        'threadId': 1,
-                        'text': self.vm.cpu.halt_reason
-                    })
-                    return
-            
-            # import time
-            # time.sleep(0.01)
-        
-        threading.Thread(target=run_vm, daemon=True).start()
+        # Run the VM off the event loop; the task reports when it stops.
+        # If it is still running (paused), resuming is enough.
+        self.vm.resume()
+        if self._vm_task is None or self._vm_task.done():
+            self._vm_task = asyncio.ensure_future(self._run_until_stopped())
+            self._vm_task.add_done_callback(self._on_vm_task_done)
         
         self._send_response(seq, 'continue', True, body={
             'allThreadsContinued': True
         })
     
+    async def _run_until_stopped(self) -> None:
+        """Run the VM in an executor and send a stopped event when it halts."""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self.vm.start)
+        
+        state = self.vm.cpu.state_int
+        if state == STATE_BREAKPOINT:
+            self._send_event('stopped', {
+                'reason': 'breakpoint',
+                'threadId': 1
+            })
+        elif state != STATE_RUNNING:
+            reason = 'exception' if state == STATE_ERROR else 'exit'
+            self._send_event('stopped', {
+                'reason': reason,
+                'threadId': 1,
+                'text': self.vm.cpu.halt_reason
+            })
+        await self._flush()
+    
+    def _on_vm_task_done(self, task: asyncio.Future) -> None:
+        """Report a VM run that failed instead of leaving the client waiting."""
+        if task.cancelled() or task.exception() is None:
+            return
+        
+        error = task.exception()
+        logger.error("VM execution failed", exc_info=error)
+        self.vm.stop()
+        self._send_event('stopped', {
+            'reason': 'exception',
+            'threadId': 1,
+            'text': f"Execution error: {error}"
+        })
+        self._flush_now()
+    
     def _handle_next(self, seq: int, args: Dict[str, Any]) -> None:
         """Handle next (step over) request."""
         if not self.vm:
@@ -381,10 +489,7 @@ class MCLDebugAdapter:
             'name': 'main',
             'line': self.vm.cpu.pc + 1,  # 1-indexed for VSCode
             'column': 1,
-            'source': {
-                'name': Path(self.source_file).name if self.source_file else 'program',
-                'path': self.source_file
-            }
+            'source': self._source_obj.copy()
         }]
         
         self._send_response(seq, 'stackTrace', True, body={
@@ -421,22 +526,18 @@ class MCLDebugAdapter:
         variables = []
         
         if variables_ref == 1:  # Registers
-            for i in range(min(16, len(self.vm.cpu.registers))):
-                value = self.vm.get_register(i)
-                variables.append({
-                    'name': f'R{i}',
-                    'value': f'0x{value:08X} ({value})',
-                    'variablesReference': 0
-                })
+            registers = self.vm.cpu.registers[:16]
+            variables = [
+                {'name': 'R%d' % i, 'value': _VALUE_FORMAT % (value, value), 'variablesReference': 0}
+                for i, value in enumerate(registers)
+            ]
         
         elif variables_ref == 2:  # Memory
             memory_dump = self.vm.get_memory_dump(0, 16)
-            for addr, value in memory_dump.items():
-                variables.append({
-                    'name': f'0x{addr:04X}',
-                    'value': f'0x{value:08X} ({value})',
-                    'variablesReference': 0
-                })
+            variables = [
+                {'name': '0x%04X' % addr, 'value': _VALUE_FORMAT % (value, value), 'variablesReference': 0}
+                for addr, value in memory_dump.items()
+            ]
         
         self._send_response(seq, 'variables', True, body={
             'variables': variables
@@ -451,21 +552,8 @@ class MCLDebugAdapter:
         expression = args.get('expression', '')
         
         try:
-            # Simple expression evaluation
-            if expression.startswith('r') or expression.startswith('R'):
-                # Register access: r0, R1, etc.
-                reg_num = int(expression[1:])
-                value = self.vm.get_register(reg_num)
-                result = f'0x{value:08X} ({value})'
-            
-            elif expression.startswith('0x'):
-                # Memory access
-                addr = int(expression, 16)
-                value = self.vm.read_memory(addr)
-                result = f'0x{value:08X} ({value})'
-            
-            else:
-                result = "Expression not supported"
+            # Hovers repeat while stopped, so results are cached per executed step
+            result = self._evaluate(expression, self.vm.cpu.pc, self.vm.cpu.instruction_count)
             
             self._send_response(seq, 'evaluate', True, body={
                 'result': result,
@@ -475,6 +563,22 @@ class MCLDebugAdapter:
         except Exception as e:
             self._send_error_response(seq, str(e))
     
+    def _evaluate_expression(self, expression: str, pc: int, instruction_count: int) -> str:
+        """Evaluate a simple expression against the current VM state (uncached)."""
+        m = _RE_EXPR.match(expression)
+        if m is None:
+            return "Expression not supported"
+        
+        reg, addr = m.groups()
+        if reg is not None:
+            # Register access: r0, R1, etc.
+            value = self.vm.get_register(int(reg))
+        else:
+            # Memory access
+            value = self.vm.read_memory(int(addr, 16))
+        
+        return _VALUE_FORMAT % (value, value)
+    
     def _handle_disconnect(self, seq: int, args: Dict[str, Any]) -> None:
         """Handle disconnect request."""
         if self.vm:
@@ -486,8 +590,7 @@ class MCLDebugAdapter:
 
 def start_debug_adapter() -> None:
     """Start the debug adapter."""
-    adapter = MCLDebugAdapter()
-    adapter.run()
+    asyncio.run(MCLDebugAdapter().run_async())
 
 
 if __name__ == '__main__':
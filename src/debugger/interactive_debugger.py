@@ -4,19 +4,57 @@ Provides a command-line interface for debugging MCL programs.
 """
 
 import cmd
-import sys
-from typing import Dict, List, Optional, Any
-from pathlib import Path
+import os
+import stat
+from typing import List, Optional
 
 from ..vm.virtual_machine import VirtualMachine, create_vm
-from ..vm.cpu import CPUState
-from rich.console import Console
+from rich.console import Console, Group, RenderableType
 from rich.table import Table
 from rich.panel import Panel
-from rich.columns import Columns
 from rich.text import Text
 
 
+# Printable ASCII column for memory dumps, indexed by low byte
+_ASCII_CHARS = [chr(i) if 32 <= i <= 126 else '.' for i in range(256)]
+
+# Per-byte hex/binary digits for register display
+_HEX8 = [f"{i:02X}" for i in range(256)]
+_BIN8 = [f"{i:08b}" for i in range(256)]
+
+# Memory dumps larger than this are printed as plain text rows, not a Table
+_PLAIN_DUMP_THRESHOLD = 64
+
+# Commands that only call a VM method and report it:
+# (command, VM method, message, style, show status afterwards, help text)
+_VM_COMMANDS = [
+    ('pause', 'pause', 'Execution paused', 'yellow', False, 'Pause execution: pause'),
+    ('stop', 'stop', 'Execution stopped', 'yellow', True, 'Stop execution: stop'),
+    ('reset', 'reset', 'Virtual machine reset', 'green', True, 'Reset the virtual machine: reset'),
+    ('clear', 'clear_all_breakpoints', 'All breakpoints cleared', 'yellow', False, 'Clear all breakpoints: clear'),
+]
+
+
+class BufferedConsole(Console):
+    """Console that collects renderables and prints them as one frame."""
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._line_buffer: List[RenderableType] = []
+    
+    def write(self, renderable: RenderableType) -> None:
+        """Queue a renderable for the next writeln()."""
+        self._line_buffer.append(renderable)
+    
+    def writeln(self) -> None:
+        """Print all queued renderables with a single render pass."""
+        if not self._line_buffer:
+            return
+        
+        self.print(Group(*self._line_buffer))
+        self._line_buffer.clear()
+
+
 class MCLDebugger(cmd.Cmd):
     """Interactive debugger for MCL programs."""
     
@@ -25,17 +63,61 @@ Type 'help' or '?' for commands.
 """
     prompt = "(mcl-debug) "
     
+    # Compact status shown after execution commands (full panel: 'status')
+    status_line_template = ("[bold]CPU:[/bold] {state}  [bold]PC:[/bold] 0x{pc:04X}  "
+                            "[bold]I:[/bold] {instructions}  [bold]C:[/bold] {cycles}")
+    
     def __init__(self):
         super().__init__()
         self.vm: Optional[VirtualMachine] = None
-        self.console = Console()
+        self.console = BufferedConsole()
         self.last_dump_address = 0
         self.last_dump_count = 16
+        
+        # Command name -> bound do_* handler, built once
+        self._cmd_table = {
+            name[3:]: getattr(self, name)
+            for name in self.get_names() if name.startswith('do_')
+        }
+    
+    def onecmd(self, line):
+        """Dispatch a command line through the prebuilt command table."""
+        cmd, arg, line = self.parseline(line)
+        if not line:
+            return self.emptyline()
+        if cmd is None:
+            return self.default(line)
+        
+        self.lastcmd = '' if line == 'EOF' else line
+        handler = self._cmd_table.get(cmd)
+        if handler is None:
+            return self.default(line)
+        return handler(arg)
     
     def preloop(self):
         """Setup before command loop."""
         self.console.print("[bold blue]MCL Interactive Debugger[/bold blue]")
         self.console.print("Load a program with 'load <filename>' to start debugging.\n")
+        
+        if self._stdin_is_file():
+            # Scripted input: queue every command up front, no prompts.
+            # Pipes may be interactive consoles, so they are read line by line.
+            self.cmdqueue.extend(self.stdin.read().splitlines())
+            self.use_rawinput = False
+            self.prompt = ""
+    
+    def _stdin_is_file(self) -> bool:
+        """Check whether stdin is a regular file that can be read to the end."""
+        try:
+            return stat.S_ISREG(os.fstat(self.stdin.fileno()).st_mode)
+        except (AttributeError, OSError, ValueError):
+            # No usable file descriptor (e.g. StringIO)
+            return False
+    
+    def postcmd(self, stop, line):
+        """Flush the views queued by the command as one frame."""
+        self.console.writeln()
+        return stop
     
     def postloop(self):
         """Cleanup after command loop."""
@@ -47,7 +129,7 @@ Type 'help' or '?' for commands.
     def do_load(self, arg: str) -> None:
         """Load an assembly file: load <filename>"""
         if not arg:
-            self.console.print("[red]Error: Please specify a filename[/red]")
+            self._error("Error: Please specify a filename")
             return
         
         try:
@@ -59,15 +141,15 @@ Type 'help' or '?' for commands.
             self.vm.load_program(arg)
             
             self.console.print(f"[green]Program loaded: {arg}[/green]")
-            self._show_status()
+            self._show_status_line()
             
         except Exception as e:
-            self.console.print(f"[red]Error loading program: {e}[/red]")
+            self._error(f"Error loading program: {e}")
     
     def do_reload(self, arg: str) -> None:
         """Reload the current program"""
         if not self.vm:
-            self.console.print("[red]No program loaded[/red]")
+            self._error("No program loaded")
             return
         
         # Note: Would need to track the filename for proper reload
@@ -78,7 +160,7 @@ Type 'help' or '?' for commands.
     def do_run(self, arg: str) -> None:
         """Run the program: run [max_cycles]"""
         if not self.vm:
-            self.console.print("[red]No program loaded[/red]")
+            self._error("No program loaded")
             return
         
         max_cycles = None
@@ -86,27 +168,15 @@ Type 'help' or '?' for commands.
             try:
                 max_cycles = int(arg)
             except ValueError:
-                self.console.print("[red]Invalid cycle count[/red]")
+                self._error("Invalid cycle count")
                 return
         
-        try:
-            self.console.print("[green]Starting execution...[/green]")
-            self.vm.start(max_cycles)
-            
-            # Wait for execution to complete or pause
-            import time
-            while self.vm.running and not self.vm.paused:
-                time.sleep(0.1)
-            
-            self._show_status()
-            
-        except Exception as e:
-            self.console.print(f"[red]Execution error: {e}[/red]")
+        self._run_until_paused(max_cycles)
     
     def do_step(self, arg: str) -> None:
         """Execute one instruction: step [count]"""
         if not self.vm:
-            self.console.print("[red]No program loaded[/red]")
+            self._error("No program loaded")
             return
         
         count = 1
@@ -114,61 +184,29 @@ Type 'help' or '?' for commands.
             try:
                 count = int(arg)
             except ValueError:
-                self.console.print("[red]Invalid step count[/red]")
+                self._error("Invalid step count")
                 return
         
-        for i in range(count):
-            if not self.vm.step():
-                break
+        self.vm.step_many(count)
         
-        self._show_status()
+        self._show_status_line()
     
     def do_continue(self, arg: str) -> None:
         """Continue execution: continue"""
         if not self.vm:
-            self.console.print("[red]No program loaded[/red]")
+            self._error("No program loaded")
             return
         
-        if not self.vm.running:
-            self.do_run("")
-        else:
+        if self.vm.running:
             self.vm.resume()
-    
-    def do_pause(self, arg: str) -> None:
-        """Pause execution: pause"""
-        if not self.vm:
-            self.console.print("[red]No program loaded[/red]")
-            return
-        
-        self.vm.pause()
-        self.console.print("[yellow]Execution paused[/yellow]")
-    
-    def do_stop(self, arg: str) -> None:
-        """Stop execution: stop"""
-        if not self.vm:
-            self.console.print("[red]No program loaded[/red]")
-            return
-        
-        self.vm.stop()
-        self.console.print("[yellow]Execution stopped[/yellow]")
-        self._show_status()
-    
-    def do_reset(self, arg: str) -> None:
-        """Reset the virtual machine: reset"""
-        if not self.vm:
-            self.console.print("[red]No program loaded[/red]")
-            return
-        
-        self.vm.reset()
-        self.console.print("[green]Virtual machine reset[/green]")
-        self._show_status()
+        self._run_until_paused(None)
     
     # Breakpoints
     
     def do_break(self, arg: str) -> None:
         """Set breakpoint: break <address>"""
         if not self.vm:
-            self.console.print("[red]No program loaded[/red]")
+            self._error("No program loaded")
             return
         
         if not arg:
@@ -180,16 +218,16 @@ Type 'help' or '?' for commands.
             self.vm.set_breakpoint(address)
             self.console.print(f"[green]Breakpoint set at 0x{address:04X}[/green]")
         except ValueError:
-            self.console.print("[red]Invalid address[/red]")
+            self._error("Invalid address")
     
     def do_delete(self, arg: str) -> None:
         """Delete breakpoint: delete <address>"""
         if not self.vm:
-            self.console.print("[red]No program loaded[/red]")
+            self._error("No program loaded")
             return
         
         if not arg:
-            self.console.print("[red]Please specify breakpoint address[/red]")
+            self._error("Please specify breakpoint address")
             return
         
         try:
@@ -197,23 +235,14 @@ Type 'help' or '?' for commands.
             self.vm.clear_breakpoint(address)
             self.console.print(f"[yellow]Breakpoint cleared at 0x{address:04X}[/yellow]")
         except ValueError:
-            self.console.print("[red]Invalid address[/red]")
-    
-    def do_clear(self, arg: str) -> None:
-        """Clear all breakpoints: clear"""
-        if not self.vm:
-            self.console.print("[red]No program loaded[/red]")
-            return
-        
-        self.vm.clear_all_breakpoints()
-        self.console.print("[yellow]All breakpoints cleared[/yellow]")
+            self._error("Invalid address")
     
     # Information display
     
     def do_status(self, arg: str) -> None:
         """Show VM status: status"""
         if not self.vm:
-            self.console.print("[red]No program loaded[/red]")
+            self._error("No program loaded")
             return
         
         self._show_status()
@@ -221,7 +250,7 @@ Type 'help' or '?' for commands.
     def do_registers(self, arg: str) -> None:
         """Show registers: registers [start] [count]"""
         if not self.vm:
-            self.console.print("[red]No program loaded[/red]")
+            self._error("No program loaded")
             return
         
         start = 0
@@ -233,13 +262,13 @@ Type 'help' or '?' for commands.
                 try:
                     start = int(parts[0])
                 except ValueError:
-                    self.console.print("[red]Invalid start register[/red]")
+                    self._error("Invalid start register")
                     return
             if len(parts) >= 2:
                 try:
                     count = int(parts[1])
                 except ValueError:
-                    self.console.print("[red]Invalid count[/red]")
+                    self._error("Invalid count")
                     return
         
         self._show_registers(start, count)
@@ -247,7 +276,7 @@ Type 'help' or '?' for commands.
     def do_memory(self, arg: str) -> None:
         """Show memory: memory [address] [count]"""
         if not self.vm:
-            self.console.print("[red]No program loaded[/red]")
+            self._error("No program loaded")
             return
         
         address = self.last_dump_address
@@ -259,13 +288,13 @@ Type 'help' or '?' for commands.
                 try:
                     address = self._parse_address(parts[0])
                 except ValueError:
-                    self.console.print("[red]Invalid address[/red]")
+                    self._error("Invalid address")
                     return
             if len(parts) >= 2:
                 try:
                     count = int(parts[1])
                 except ValueError:
-                    self.console.print("[red]Invalid count[/red]")
+                    self._error("Invalid count")
                     return
         
         self.last_dump_address = address
@@ -276,7 +305,7 @@ Type 'help' or '?' for commands.
     def do_program(self, arg: str) -> None:
         """Show program: program [start] [count]"""
         if not self.vm:
-            self.console.print("[red]No program loaded[/red]")
+            self._error("No program loaded")
             return
         
         start = max(0, self.vm.cpu.pc - 5)
@@ -288,13 +317,13 @@ Type 'help' or '?' for commands.
                 try:
                     start = int(parts[0])
                 except ValueError:
-                    self.console.print("[red]Invalid start address[/red]")
+                    self._error("Invalid start address")
                     return
             if len(parts) >= 2:
                 try:
                     count = int(parts[1])
                 except ValueError:
-                    self.console.print("[red]Invalid count[/red]")
+                    self._error("Invalid count")
                     return
         
         self._show_program(start, count)
@@ -304,12 +333,12 @@ Type 'help' or '?' for commands.
     def do_set(self, arg: str) -> None:
         """Set register or memory: set reg <reg> <value> | set mem <addr> <value>"""
         if not self.vm:
-            self.console.print("[red]No program loaded[/red]")
+            self._error("No program loaded")
             return
         
         parts = arg.split()
         if len(parts) < 3:
-            self.console.print("[red]Usage: set reg <reg> <value> | set mem <addr> <value>[/red]")
+            self._error("Usage: set reg <reg> <value> | set mem <addr> <value>")
             return
         
         try:
@@ -326,10 +355,10 @@ Type 'help' or '?' for commands.
                 self.console.print(f"[green]Memory[0x{address:04X}] = 0x{value:08X}[/green]")
             
             else:
-                self.console.print("[red]Usage: set reg <reg> <value> | set mem <addr> <value>[/red]")
+                self._error("Usage: set reg <reg> <value> | set mem <addr> <value>")
         
         except (ValueError, Exception) as e:
-            self.console.print(f"[red]Error: {e}[/red]")
+            self._error(f"Error: {e}")
     
     # Utility commands
     
@@ -342,6 +371,10 @@ Type 'help' or '?' for commands.
         """Exit the debugger: exit"""
         return self.do_quit(arg)
     
+    def do_EOF(self, arg: str) -> bool:
+        """Exit the debugger at end of input"""
+        return self.do_quit(arg)
+    
     def do_help(self, arg: str) -> None:
         """Show help: help [command]"""
         if arg:
@@ -380,6 +413,25 @@ Type 'help' or '?' for commands.
     
     # Helper methods
     
+    def _error(self, message: str) -> None:
+        """Print an error message in red, without markup parsing."""
+        self.console.print(message, style="red", markup=False, highlight=False)
+    
+    def _run_until_paused(self, max_cycles: Optional[int]) -> None:
+        """Start execution if needed and wait for it to pause or finish."""
+        try:
+            if not self.vm.running:
+                self.console.print("[green]Starting execution...[/green]")
+                self.vm.start(max_cycles)
+            
+            # Wait for execution to complete or pause
+            self.vm.wait_until_paused()
+            
+            self._show_status_line()
+            
+        except Exception as e:
+            self._error(f"Execution error: {e}")
+    
     def _show_status(self) -> None:
         """Display VM status."""
         if not self.vm:
@@ -400,7 +452,24 @@ Type 'help' or '?' for commands.
         if cpu_state.get('halt_reason'):
             status_text += f"\n[bold]Halt Reason:[/bold] {cpu_state['halt_reason']}"
         
-        self.console.print(Panel(status_text, title="VM Status", border_style="green"))
+        self.console.write(Panel(status_text, title="VM Status", border_style="green"))
+    
+    def _show_status_line(self) -> None:
+        """Display a one-line VM status summary."""
+        if not self.vm:
+            return
+        
+        cpu = self.vm.cpu
+        status = self.status_line_template.format(
+            state=cpu.state.value,
+            pc=cpu.pc,
+            instructions=cpu.instruction_count,
+            cycles=cpu.cycle_count
+        )
+        if cpu.halt_reason:
+            status += f"  [bold]Halt:[/bold] {cpu.halt_reason}"
+        
+        self.console.write(status)
     
     def _show_registers(self, start: int = 0, count: int = 16) -> None:
         """Display registers."""
@@ -412,20 +481,34 @@ Type 'help' or '?' for commands.
         
         for i in range(start, min(start + count, len(self.vm.cpu.registers))):
             value = self.vm.get_register(i)
+            b3 = (value >> 24) & 0xFF
+            b2 = (value >> 16) & 0xFF
+            b1 = (value >> 8) & 0xFF
+            b0 = value & 0xFF
             table.add_row(
                 f"R{i}",
-                f"0x{value & 0xFFFFFFFF:08X}",
+                "0x" + _HEX8[b3] + _HEX8[b2] + _HEX8[b1] + _HEX8[b0],
                 f"{value}",
-                f"{value & 0xFFFFFFFF:032b}"
+                _BIN8[b3] + _BIN8[b2] + _BIN8[b1] + _BIN8[b0]
             )
         
-        self.console.print(table)
+        self.console.write(table)
     
     def _show_memory(self, address: int, count: int = 16) -> None:
         """Display memory contents."""
         try:
             memory_data = self.vm.get_memory_dump(address, count)
             
+            if count > _PLAIN_DUMP_THRESHOLD:
+                # Bulk dump: fixed-width rows skip Rich's table layout
+                rows = [f"Memory (0x{address:04X})", f"{'Address':<9}{'Hex':<12}{'Dec':>10}  ASCII"]
+                rows.extend(
+                    f"0x{addr:04X}   0x{value:08X}  {value:>10}  {_ASCII_CHARS[value & 0xFF]}"
+                    for addr, value in memory_data.items()
+                )
+                self.console.write(Text("\n".join(rows)))
+                return
+            
             table = Table(title=f"Memory (0x{address:04X})")
             table.add_column("Address", style="cyan")
             table.add_column("Hex", style="green")
@@ -433,18 +516,17 @@ Type 'help' or '?' for commands.
             table.add_column("ASCII", style="blue")
             
             for addr, value in memory_data.items():
-                ascii_char = chr(value & 0xFF) if 32 <= (value & 0xFF) <= 126 else '.'
                 table.add_row(
                     f"0x{addr:04X}",
                     f"0x{value:08X}",
                     f"{value}",
-                    ascii_char
+                    _ASCII_CHARS[value & 0xFF]
                 )
             
-            self.console.print(table)
+            self.console.write(table)
             
         except Exception as e:
-            self.console.print(f"[red]Error reading memory: {e}[/red]")
+            self._error(f"Error reading memory: {e}")
     
     def _show_program(self, start: int = 0, count: int = 10) -> None:
         """Display program instructions."""
@@ -456,21 +538,26 @@ Type 'help' or '?' for commands.
             table.add_column("Instruction", style="green")
             table.add_column("PC", style="red")
             
-            for i, line in enumerate(program_data):
-                addr = start + i
-                pc_marker = ">>>" if addr == self.vm.cpu.pc else ""
-                breakpoint_marker = "*" if addr in self.vm.breakpoints else ""
+            # Snapshot once per refresh; breakpoints is a set, so membership is O(1)
+            pc = self.vm.cpu.pc
+            breakpoints = self.vm.breakpoints
+            if not isinstance(breakpoints, (set, frozenset)):
+                breakpoints = frozenset(breakpoints)
+            
+            for addr, instruction in program_data:
+                pc_marker = ">>>" if addr == pc else ""
+                breakpoint_marker = "*" if addr in breakpoints else ""
                 
                 table.add_row(
                     f"{addr:04d}",
-                    line.split(': ', 1)[1] if ': ' in line else line,
+                    instruction,
                     f"{pc_marker} {breakpoint_marker}"
                 )
             
-            self.console.print(table)
+            self.console.write(table)
             
         except Exception as e:
-            self.console.print(f"[red]Error reading program: {e}[/red]")
+            self._error(f"Error reading program: {e}")
     
     def _list_breakpoints(self) -> None:
         """List all breakpoints."""
@@ -484,19 +571,39 @@ Type 'help' or '?' for commands.
         for addr in sorted(self.vm.breakpoints):
             table.add_row(f"0x{addr:04X}")
         
-        self.console.print(table)
+        self.console.write(table)
     
     def _parse_address(self, addr_str: str) -> int:
-        """Parse address string (hex or decimal)."""
-        if addr_str.startswith('0x') or addr_str.startswith('0X'):
-            return int(addr_str, 16)
-        return int(addr_str)
+        """Parse address string (hex, octal, binary or decimal)."""
+        return self._parse_value(addr_str)
     
     def _parse_value(self, value_str: str) -> int:
-        """Parse value string (hex or decimal)."""
-        if value_str.startswith('0x') or value_str.startswith('0X'):
-            return int(value_str, 16)
-        return int(value_str)
+        """Parse value string (hex, octal, binary or decimal)."""
+        try:
+            return int(value_str, 0)
+        except ValueError:
+            # Plain decimals with leading zeros (e.g. 010) are still decimal
+            return int(value_str, 10)
+
+
+def _make_vm_command(method: str, message: str, style: str, show_status: bool, doc: str):
+    """Build a do_* handler that calls a VM method and reports it."""
+    def command(self: MCLDebugger, arg: str) -> None:
+        if not self.vm:
+            self._error("No program loaded")
+            return
+        
+        getattr(self.vm, method)()
+        self.console.print(message, style=style)
+        if show_status:
+            self._show_status_line()
+    
+    command.__doc__ = doc
+    return command
+
+
+for _name, _method, _message, _style, _show_status, _doc in _VM_COMMANDS:
+    setattr(MCLDebugger, f'do_{_name}', _make_vm_command(_method, _message, _style, _show_status, _doc))
 
 
 def start_interactive_debugger(program_file: Optional[str] = None) -> None:
@@ -509,6 +616,7 @@ def start_interactive_debugger(program_file: Optional[str] = None) -> None:
     
     if program_file:
         debugger.onecmd(f"load {program_file}")
+        debugger.console.writeln()
     
     try:
         debugger.cmdloop()
@@ -8,12 +8,17 @@ import argparse
 from pathlib import Path
 from typing import Optional
 
-from .interactive_debugger import start_interactive_debugger
-from .debug_adapter import start_debug_adapter
+
+VERSION = "MCL Debugger v0.1.0"
 
 
 def main() -> int:
     """Main entry point for the debugger."""
+    # Answer --version before paying for parser construction
+    if '--version' in sys.argv[1:]:
+        print(VERSION)
+        return 0
+    
     parser = argparse.ArgumentParser(
         description="MCL Debugger - Debug MCL assembly programs",
         formatter_class=argparse.RawDescriptionHelpFormatter,
@@ -47,17 +52,20 @@ Examples:
     parser.add_argument(
         "--version",
         action="version",
-        version="MCL Debugger v0.1.0"
+        version=VERSION
     )
     
     args = parser.parse_args()
     
     try:
+        # Import only the front end in use (the adapter does not need rich)
         if args.adapter:
             # Start debug adapter for VSCode
+            from .debug_adapter import start_debug_adapter
             start_debug_adapter()
         else:
             # Start interactive debugger (default)
+            from .interactive_debugger import start_interactive_debugger
             program_file = str(args.program) if args.program else None
             start_interactive_debugger(program_file)
         
@@ -12,19 +12,31 @@ from typing import Optional
 # Add parent directory to path for imports
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
 
-try:
-    from src.language_server.server import mcl_server
-except ImportError:
-    # Fallback for different import contexts
+
+def _load_server():
+    """Import the language server (deferred so --help/--version stay cheap)."""
     try:
-        from .server import mcl_server
+        from src.language_server.server import mcl_server
     except ImportError:
-        # Direct execution context
-        from server import mcl_server
+        # Fallback for different import contexts
+        try:
+            from .server import mcl_server
+        except ImportError:
+            # Direct execution context
+            from server import mcl_server
+    return mcl_server
+
+
+VERSION = "MCL Language Server v0.1.0"
 
 
 def main() -> int:
     """Main entry point for the language server."""
+    # Answer --version before paying for parser construction
+    if '--version' in sys.argv[1:]:
+        print(VERSION)
+        return 0
+    
     parser = argparse.ArgumentParser(
         description="MCL Language Server - Provides LSP support for MCL",
         formatter_class=argparse.RawDescriptionHelpFormatter,
@@ -71,7 +83,7 @@ Examples:
     parser.add_argument(
         "--version",
         action="version",
-        version="MCL Language Server v0.1.0"
+        version=VERSION
     )
     
     args = parser.parse_args()
@@ -81,6 +93,8 @@ Examples:
             import logging
             logging.basicConfig(level=logging.DEBUG)
         
+        mcl_server = _load_server()
+        
         if args.websocket:
             print(f"Starting MCL Language Server on WebSocket {args.host}:{args.port}")
             mcl_server.start_ws(args.host, args.port)
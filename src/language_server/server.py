@@ -3,9 +3,12 @@
 Implements Language Server Protocol for MCL language support in VSCode.
 """
 
+import array
 import asyncio
+import hashlib
 import re
-from typing import List, Optional, Dict, Any, Union
+from collections import OrderedDict
+from typing import List, Optional, Dict, Any, Tuple, Union
 from pathlib import Path
 
 from pygls.server import LanguageServer
@@ -95,14 +98,162 @@ except ImportError:
             return source
 
 
+# Line number embedded in preprocessor error messages ("file:LINE: ...")
+_ERR_LINE_RE = re.compile(r':(\d+):')
+
+# Runs of word characters, used to find the word under the cursor
+_WORD_RE = re.compile(r'\w+')
+
+# Partial word immediately before the cursor, used to filter completions
+_PREFIX_RE = re.compile(r'\w+$')
+
+
+# Hover documentation
+_DIRECTIVE_DESCRIPTIONS = {
+    'include': '**#include "path"**\n\nSplice another `.mcl` file in-place. Path is relative to the current file.\n\nExample: `#include "utils/math.mcl"`',
+    'define':  '**#define NAME [value]**\n\nDefine a macro flag or text-substitution macro.\n\n- Flag form: `#define DEBUG`\n- Value form: `#define SIZE 64`',
+    'undef':   '**#undef NAME**\n\nRemove a previously defined macro name.',
+    'ifdef':   '**#ifdef NAME**\n\nEmit the enclosed block only when `NAME` has been `#define`d.',
+    'ifndef':  '**#ifndef NAME**\n\nEmit the enclosed block only when `NAME` has **not** been `#define`d. Typical use: include guards.',
+    'else':    '**#else**\n\nAlternative branch for an open `#ifdef` / `#ifndef` block.',
+    'endif':   '**#endif**\n\nClose an open `#ifdef` / `#ifndef` block.',
+}
+
+_KEYWORD_DESCRIPTIONS = {
+    'var': 'Declares a new variable',
+    'function': 'Declares a new function',
+    'if': 'Conditional statement',
+    'else': 'Alternative branch in conditional statement',
+    'elif': 'Additional conditional branch',
+    'while': 'Loop that continues while condition is true',
+    'for': 'Loop with initialization, condition, and increment',
+    'switch': 'Multi-way branch statement',
+    'case': 'Branch case in switch statement',
+    'default': 'Default case in switch statement',
+    'return': 'Returns from function',
+    'break': 'Exits from loop or switch',
+    'continue': 'Skips to next iteration of loop',
+}
+
+_TYPE_DESCRIPTIONS = {
+    'int': 'Integer type - 32-bit signed integer',
+    'char': 'Character type - stored as ASCII value',
+    'void': 'Void type - used for functions with no return value',
+}
+
+_INSTRUCTION_DESCRIPTIONS = {
+    'LOAD': 'LOAD A, B - Load data at register A into RAM address B',
+    'READ': 'READ A, B - Load data at RAM address A into register B',
+    'MVR': 'MVR A, B - Copy register A to register B',
+    'MVM': 'MVM A, B - Copy RAM address A to RAM address B',
+    'ADD': 'ADD A, B - Add A and B, store result in return registers',
+    'SUB': 'SUB A, B - Subtract B from A, store result in return registers',
+    'MULT': 'MULT A, B - Multiply A and B, store result in return registers',
+    'DIV': 'DIV A, B - Divide A by B, store result in return registers',
+    'SHL': 'SHL A, B - Shift A left by B bits',
+    'SHR': 'SHR A, B - Shift A right by B bits',
+    'JMP': 'JMP A - Jump to address A',
+    'JAL': 'JAL A - Jump to address A and store return address',
+    'JBT': 'JBT A, x, y - Jump to A if register x > register y',
+    'JZ': 'JZ A, x - Jump to A if register x == 0',
+    'JNZ': 'JNZ A, x - Jump to A if register x != 0',
+}
+
+
+# Semantic token type index for each lexer TokenType. Names the lexer does
+# not define are skipped, so the table also builds against the stub TokenType.
+_KEYWORD_TOKEN_NAMES = (
+    'VAR', 'IF', 'ELSE', 'ELIF', 'WHILE', 'FOR', 'SWITCH', 'CASE',
+    'DEFAULT', 'FUNCTION', 'RETURN', 'BREAK', 'CONTINUE',
+)
+_OPERATOR_TOKEN_NAMES = (
+    'PLUS', 'MINUS', 'MULTIPLY', 'DIVIDE', 'MODULO', 'ASSIGN',
+    'EQUALS', 'NOT_EQUALS', 'LESS_THAN', 'GREATER_THAN', 'LESS_EQUAL',
+    'GREATER_EQUAL', 'LOGICAL_AND', 'LOGICAL_OR', 'LOGICAL_NOT',
+    'BITWISE_AND', 'BITWISE_OR', 'BITWISE_XOR', 'BITWISE_NOT',
+    'SHIFT_LEFT', 'SHIFT_RIGHT',
+)
+_TOKEN_TYPE_IDX = {
+    getattr(TokenType, name): idx
+    for names, idx in ((_KEYWORD_TOKEN_NAMES, 0),    # Keyword
+                       (('INTEGER',), 4),            # Number
+                       (('CHAR',), 5),               # String (character)
+                       (('COMMENT',), 6),            # Comment
+                       (_OPERATOR_TOKEN_NAMES, 7))   # Operator
+    for name in names
+    if hasattr(TokenType, name)
+}
+_IDENTIFIER_TOKEN = getattr(TokenType, 'IDENTIFIER', None)
+_EOF_TOKEN = getattr(TokenType, 'EOF', None)
+
+
+def _digest(text: str) -> bytes:
+    """Short content hash used to recognise unchanged document text."""
+    return hashlib.blake2b(text.encode(), digest_size=16).digest()
+
+
+def _base_dir_from_uri(uri: str) -> Path:
+    """Extract a plausible base dir for #include resolution from a file:// URI."""
+    base_dir = Path('.')
+    if uri.startswith('file://'):
+        raw = uri[7:]
+        # On Windows URIs look like file:///C:/path/to/file.mcl
+        raw = raw.lstrip('/')
+        try:
+            base_dir = Path(raw).parent
+        except Exception:
+            pass
+    return base_dir
+
+
+def _new_event_loop() -> asyncio.AbstractEventLoop:
+    """Create the server's event loop, using uvloop when it is installed."""
+    try:
+        import uvloop
+    except ImportError:
+        loop = asyncio.new_event_loop()
+    else:
+        loop = uvloop.new_event_loop()
+    asyncio.set_event_loop(loop)
+    return loop
+
+
 class MCLLanguageServer(LanguageServer):
     """Language Server for MCL."""
     
+    # Number of (uri, text) entries kept in the token and AST caches
+    PARSE_CACHE_SIZE = 32
+    
+    # Seconds of quiet after an edit before diagnostics and semantic tokens
+    # are computed for it
+    CHANGE_DEBOUNCE = 0.15
+    
     def __init__(self):
-        super().__init__("mcl-language-server", "0.1.0")
+        super().__init__("mcl-language-server", "0.1.0", loop=_new_event_loop())
+        # The loop was created for this server, so let shutdown() close it
+        self._owns_loop = True
+        
+        # Open documents live in pygls's workspace, which applies incremental
+        # edits in the client's position encoding. Their split lines are
+        # cached here, keyed by the text they were split from.
+        self._lines_cache: Dict[str, Tuple[str, List[str]]] = {}
+        # Directory #include paths resolve against, per document
+        self.base_dirs: Dict[str, Path] = {}
+        
+        # Lex/parse results keyed by (uri, digest of the text that was lexed)
+        self._token_cache: "OrderedDict[tuple, list]" = OrderedDict()
+        self._ast_cache: "OrderedDict[tuple, Any]" = OrderedDict()
         
-        # Document cache
-        self.documents: Dict[str, str] = {}
+        # Most recent hover: (uri, line, word start, word end, Hover)
+        self._last_hover: Optional[Tuple[str, int, int, int, Hover]] = None
+        
+        # Last diagnostics report per document, with the digest of its text
+        # (or the still-running computation, shared by concurrent pulls)
+        self._diag_cache: Dict[str, Tuple[bytes, asyncio.Future]] = {}
+        
+        # Per document, a timer that finishes once edits have been quiet for
+        # CHANGE_DEBOUNCE seconds
+        self._debounce_timers: Dict[str, asyncio.Task] = {}
         
         # Semantic token types and modifiers
         self.semantic_token_types = [
@@ -124,17 +275,17 @@ class MCLLanguageServer(LanguageServer):
         ]
         
         # MCL language keywords and constructs
-        self.keywords = {
+        self.keywords = frozenset(map(sys.intern, (
             'var', 'function', 'if', 'else', 'elif', 'while', 'for',
             'switch', 'case', 'default', 'return', 'break', 'continue'
-        }
+        )))
         
         self.operators = {
             '+', '-', '*', '/', '%', '=', '==', '!=', '<', '>', '<=', '>=',
             '&&', '||', '!', '&', '|', '^', '~', '<<', '>>', '->', '++', '--'
         }
         
-        self.types = {'int', 'char', 'void'}
+        self.types = frozenset(map(sys.intern, ('int', 'char', 'void')))
         
         # Preprocessor directives
         self.preprocessor_directives = [
@@ -148,11 +299,187 @@ class MCLLanguageServer(LanguageServer):
         ]
         
         # Assembly instructions for completion
-        self.assembly_instructions = {
+        self.assembly_instructions = frozenset(map(sys.intern, (
             'LOAD', 'READ', 'MVR', 'MVM', 'ADD', 'SUB', 'MULT', 'DIV',
             'SHL', 'SHR', 'SHLR', 'JMP', 'JAL', 'JBT', 'JZ', 'JNZ',
             'DRLINE', 'DRGRD', 'CLRGRID', 'LDSPR', 'DRSPR', 'LDTXT', 'DRTXT', 'SCRLBFR'
-        }
+        )))
+        
+        # Built-in functions/constructs
+        self.builtins = [
+            ('main', 'function main() -> int', 'Main function'),
+            ('printf', 'printf(format, ...)', 'Print formatted output (if supported)'),
+        ]
+        
+        # Hover markdown for every known word; keywords win over types, types
+        # over assembly instructions
+        self._hover_bodies: Dict[str, str] = {}
+        for words, descriptions, fallback in (
+            (self.assembly_instructions, _INSTRUCTION_DESCRIPTIONS, 'Assembly instruction'),
+            (self.types, _TYPE_DESCRIPTIONS, 'MCL type'),
+            (self.keywords, _KEYWORD_DESCRIPTIONS, 'MCL keyword'),
+        ):
+            for word in words:
+                text = descriptions.get(word, f'{fallback}: {word}')
+                self._hover_bodies[word] = f"**{word}**\n\n{text}"
+        
+        # Completion items never change, so build them once
+        self._preproc_items = tuple(
+            CompletionItem(
+                label=label,
+                kind=CompletionItemKind.Keyword,
+                detail=signature,
+                documentation=description,
+                insert_text=label,
+            )
+            for label, signature, description in (
+                (sys.intern(f"#{name}"), signature, description)
+                for name, signature, description in self.preprocessor_directives
+            )
+        )
+        self._preproc_prefixes = tuple(item.label for item in self._preproc_items)
+        self._keyword_items = tuple(
+            CompletionItem(
+                label=keyword,
+                kind=CompletionItemKind.Keyword,
+                detail=f"MCL keyword: {keyword}"
+            )
+            for keyword in self.keywords
+        )
+        self._type_items = tuple(
+            CompletionItem(
+                label=type_name,
+                kind=CompletionItemKind.TypeParameter,
+                detail=f"MCL type: {type_name}"
+            )
+            for type_name in self.types
+        )
+        self._builtin_items = tuple(
+            CompletionItem(
+                label=name,
+                kind=CompletionItemKind.Function,
+                detail=signature,
+                documentation=description
+            )
+            for name, signature, description in self.builtins
+        )
+        self._asm_items = tuple(
+            CompletionItem(
+                label=instr,
+                kind=CompletionItemKind.Function,
+                detail=f"Assembly instruction: {instr}"
+            )
+            for instr in self.assembly_instructions
+        )
+    
+    def get_text(self, uri: str) -> Optional[str]:
+        """Return an open document's text, or None if it is not open."""
+        document = self.workspace.text_documents.get(uri)
+        return None if document is None else document.source
+    
+    def get_lines(self, uri: str) -> Optional[List[str]]:
+        """Return an open document's lines (without line endings), or None."""
+        text = self.get_text(uri)
+        if text is None:
+            return None
+        cached = self._lines_cache.get(uri)
+        if cached is None or cached[0] is not text:
+            cached = self._lines_cache[uri] = (text, text.split('\n'))
+        return cached[1]
+    
+    def to_server_position(self, lines: List[str], position: Position) -> Position:
+        """Convert a client position (UTF-16 by default) to a code point column."""
+        return self.workspace.position_codec.position_from_client_units(lines, position)
+    
+    def to_client_range(self, lines: List[str], server_range: Range) -> Range:
+        """Convert a range with code point columns to the client's encoding."""
+        return self.workspace.position_codec.range_to_client_units(lines, server_range)
+    
+    def _forget_hover(self, uri: str) -> None:
+        """Drop the remembered hover if it belongs to a document that changed."""
+        if self._last_hover is not None and self._last_hover[0] == uri:
+            self._last_hover = None
+    
+    def close_document(self, uri: str) -> None:
+        """Forget everything cached for a closed document."""
+        self._lines_cache.pop(uri, None)
+        self.base_dirs.pop(uri, None)
+        self._diag_cache.pop(uri, None)
+        self._forget_hover(uri)
+        self.cancel_debounce(uri)
+        self.invalidate(uri)
+    
+    def run_cpu(self, func, *args) -> asyncio.Future:
+        """Run CPU-bound compiler work on the server's thread pool."""
+        return asyncio.get_running_loop().run_in_executor(
+            self.thread_pool_executor, func, *args)
+    
+    async def _cached(self, cache: OrderedDict, uri: str, text: str, build):
+        """Return await build(text) from an LRU cache keyed by uri and text digest.
+        
+        The cache is only touched from the event loop; build() does the
+        off-loop work.
+        """
+        key = (uri, _digest(text))
+        result = cache.get(key)
+        if result is not None:
+            cache.move_to_end(key)
+            return result
+        result = await build(text)
+        cache[key] = result
+        if len(cache) > self.PARSE_CACHE_SIZE:
+            cache.popitem(last=False)
+        return result
+    
+    async def get_tokens(self, uri: str, text: str) -> list:
+        """Tokenize text, reusing the previous result if it is unchanged."""
+        return await self._cached(self._token_cache, uri, text,
+                                  lambda t: self.run_cpu(tokenize, t))
+    
+    async def get_ast(self, uri: str, text: str):
+        """Parse text, reusing the previous AST if it is unchanged."""
+        async def build(t):
+            return await self.run_cpu(parse, await self.get_tokens(uri, t))
+        return await self._cached(self._ast_cache, uri, text, build)
+    
+    def invalidate(self, uri: str) -> None:
+        """Drop cached tokens and ASTs belonging to a document."""
+        for cache in (self._token_cache, self._ast_cache):
+            for key in [k for k in cache if k[0] == uri]:
+                del cache[key]
+    
+    def debounce(self, uri: str) -> None:
+        """Restart a document's debounce timer after an edit."""
+        timer = self._debounce_timers.get(uri)
+        if timer is not None:
+            timer.cancel()
+        self._debounce_timers[uri] = asyncio.create_task(self._debounce_timer(uri))
+    
+    def cancel_debounce(self, uri: str) -> None:
+        """Stop a document's debounce timer."""
+        timer = self._debounce_timers.pop(uri, None)
+        if timer is not None:
+            timer.cancel()
+    
+    async def wait_for_edits(self, uri: str) -> None:
+        """Wait until edits to a document have settled.
+        
+        Pulls that arrive during a burst of keystrokes all resume together
+        and see the settled text, so the pipeline runs once for it.
+        """
+        timer = self._debounce_timers.get(uri)
+        while timer is not None:
+            # wait() does not raise when the timer is cancelled by a newer edit
+            await asyncio.wait((timer,))
+            timer = self._debounce_timers.get(uri)
+    
+    async def _debounce_timer(self, uri: str) -> None:
+        try:
+            await asyncio.sleep(self.CHANGE_DEBOUNCE)
+        except asyncio.CancelledError:
+            return
+        if self._debounce_timers.get(uri) is asyncio.current_task():
+            del self._debounce_timers[uri]
 
 
 mcl_server = MCLLanguageServer()
@@ -164,71 +491,36 @@ async def completion(params: CompletionParams) -> CompletionList:
     document_uri = params.text_document.uri
     position = params.position
     
-    if document_uri not in mcl_server.documents:
-        return CompletionList(is_incomplete=False, items=[])
-    
-    text = mcl_server.documents[document_uri]
-    lines = text.split('\n')
-    
-    if position.line >= len(lines):
+    lines = mcl_server.get_lines(document_uri)
+    if lines is None or position.line >= len(lines):
         return CompletionList(is_incomplete=False, items=[])
     
+    position = mcl_server.to_server_position(lines, position)
     current_line = lines[position.line][:position.character]
     
-    # Determine context and provide appropriate completions
-    items = []
-    
     # Preprocessor directives — triggered when line starts with '#'
     stripped = current_line.lstrip()
     if stripped.startswith('#'):
-        for name, signature, description in mcl_server.preprocessor_directives:
-            items.append(CompletionItem(
-                label=f"#{name}",
-                kind=CompletionItemKind.Keyword,
-                detail=signature,
-                documentation=description,
-                insert_text=f"#{name}",
-            ))
-        return CompletionList(is_incomplete=False, items=items)
-    
-    # Keywords
-    for keyword in mcl_server.keywords:
-        items.append(CompletionItem(
-            label=keyword,
-            kind=CompletionItemKind.Keyword,
-            detail=f"MCL keyword: {keyword}"
-        ))
+        items = mcl_server._preproc_items
+        if stripped.startswith(mcl_server._preproc_prefixes):
+            # Directive already typed in full; only offer that one
+            items = [item for item in items if stripped.startswith(item.label)]
+        return CompletionList(is_incomplete=False, items=list(items))
     
-    # Types
-    for type_name in mcl_server.types:
-        items.append(CompletionItem(
-            label=type_name,
-            kind=CompletionItemKind.TypeParameter,
-            detail=f"MCL type: {type_name}"
-        ))
-    
-    # Built-in functions/constructs
-    builtins = [
-        ('main', 'function main() -> int', 'Main function'),
-        ('printf', 'printf(format, ...)', 'Print formatted output (if supported)'),
-    ]
-    
-    for name, signature, description in builtins:
-        items.append(CompletionItem(
-            label=name,
-            kind=CompletionItemKind.Function,
-            detail=signature,
-            documentation=description
-        ))
+    # Keywords, types and built-in functions/constructs
+    items = [*mcl_server._keyword_items, *mcl_server._type_items, *mcl_server._builtin_items]
     
     # If in assembly context, add assembly instructions
     if '.asm' in document_uri or 'assembly' in current_line.lower():
-        for instr in mcl_server.assembly_instructions:
-            items.append(CompletionItem(
-                label=instr,
-                kind=CompletionItemKind.Function,
-                detail=f"Assembly instruction: {instr}"
-            ))
+        items.extend(mcl_server._asm_items)
+    
+    # Only send items matching the word being typed; ask the client to come
+    # back while the prefix is still too short to be selective
+    match = _PREFIX_RE.search(current_line)
+    if match:
+        prefix = match.group().lower()
+        items = [item for item in items if item.label.lower().startswith(prefix)]
+        return CompletionList(is_incomplete=len(prefix) <= 1, items=items)
     
     return CompletionList(is_incomplete=False, items=items)
 
@@ -239,199 +531,112 @@ async def hover(params: HoverParams) -> Optional[Hover]:
     document_uri = params.text_document.uri
     position = params.position
     
-    if document_uri not in mcl_server.documents:
+    lines = mcl_server.get_lines(document_uri)
+    if lines is None or position.line >= len(lines):
         return None
     
-    text = mcl_server.documents[document_uri]
-    lines = text.split('\n')
+    position = mcl_server.to_server_position(lines, position)
     
-    if position.line >= len(lines):
-        return None
+    # Still inside the word hovered last time (e.g. while the cursor drags)
+    last = mcl_server._last_hover
+    if (last is not None and last[0] == document_uri and last[1] == position.line
+            and last[2] <= position.character <= last[3]):
+        return last[4]
     
     line = lines[position.line]
     
     # Find word at position
-    word_start = position.character
-    word_end = position.character
-    
-    while word_start > 0 and (line[word_start - 1].isalnum() or line[word_start - 1] == '_'):
-        word_start -= 1
-    
-    while word_end < len(line) and (line[word_end].isalnum() or line[word_end] == '_'):
-        word_end += 1
-    
-    if word_start == word_end:
+    for match in _WORD_RE.finditer(line):
+        if match.start() > position.character:
+            return None
+        if position.character <= match.end():
+            break
+    else:
         return None
     
-    word = line[word_start:word_end]
+    word_start, word_end = match.span()
+    word = match.group()
     
     # Check for preprocessor directive (word preceded by '#' on the same line)
+    body = None
     pre_word = line[:word_start].rstrip()
     if pre_word.endswith('#') or word.startswith('#'):
-        directive = word.lstrip('#')
-        directive_descriptions = {
-            'include': '**#include "path"**\n\nSplice another `.mcl` file in-place. Path is relative to the current file.\n\nExample: `#include "utils/math.mcl"`',
-            'define':  '**#define NAME [value]**\n\nDefine a macro flag or text-substitution macro.\n\n- Flag form: `#define DEBUG`\n- Value form: `#define SIZE 64`',
-            'undef':   '**#undef NAME**\n\nRemove a previously defined macro name.',
-            'ifdef':   '**#ifdef NAME**\n\nEmit the enclosed block only when `NAME` has been `#define`d.',
-            'ifndef':  '**#ifndef NAME**\n\nEmit the enclosed block only when `NAME` has **not** been `#define`d. Typical use: include guards.',
-            'else':    '**#else**\n\nAlternative branch for an open `#ifdef` / `#ifndef` block.',
-            'endif':   '**#endif**\n\nClose an open `#ifdef` / `#ifndef` block.',
-        }
-        if directive in directive_descriptions:
-            return Hover(
-                contents=MarkupContent(
-                    kind=MarkupKind.Markdown,
-                    value=directive_descriptions[directive]
-                ),
-                range=Range(
-                    start=Position(line=position.line, character=word_start),
-                    end=Position(line=position.line, character=word_end)
-                )
-            )
+        body = _DIRECTIVE_DESCRIPTIONS.get(word.lstrip('#'))
     
     # Provide hover information based on word
-    hover_text = None
-    
-    if word in mcl_server.keywords:
-        hover_descriptions = {
-            'var': 'Declares a new variable',
-            'function': 'Declares a new function',
-            'if': 'Conditional statement',
-            'else': 'Alternative branch in conditional statement',
-            'elif': 'Additional conditional branch',
-            'while': 'Loop that continues while condition is true',
-            'for': 'Loop with initialization, condition, and increment',
-            'switch': 'Multi-way branch statement',
-            'case': 'Branch case in switch statement',
-            'default': 'Default case in switch statement',
-            'return': 'Returns from function',
-            'break': 'Exits from loop or switch',
-            'continue': 'Skips to next iteration of loop'
-        }
-        hover_text = hover_descriptions.get(word, f'MCL keyword: {word}')
-    
-    elif word in mcl_server.types:
-        type_descriptions = {
-            'int': 'Integer type - 32-bit signed integer',
-            'char': 'Character type - stored as ASCII value',
-            'void': 'Void type - used for functions with no return value'
-        }
-        hover_text = type_descriptions.get(word, f'MCL type: {word}')
-    
-    elif word in mcl_server.assembly_instructions:
-        instruction_descriptions = {
-            'LOAD': 'LOAD A, B - Load data at register A into RAM address B',
-            'READ': 'READ A, B - Load data at RAM address A into register B',
-            'MVR': 'MVR A, B - Copy register A to register B',
-            'MVM': 'MVM A, B - Copy RAM address A to RAM address B',
-            'ADD': 'ADD A, B - Add A and B, store result in return registers',
-            'SUB': 'SUB A, B - Subtract B from A, store result in return registers',
-            'MULT': 'MULT A, B - Multiply A and B, store result in return registers',
-            'DIV': 'DIV A, B - Divide A by B, store result in return registers',
-            'SHL': 'SHL A, B - Shift A left by B bits',
-            'SHR': 'SHR A, B - Shift A right by B bits',
-            'JMP': 'JMP A - Jump to address A',
-            'JAL': 'JAL A - Jump to address A and store return address',
-            'JBT': 'JBT A, x, y - Jump to A if register x > register y',
-            'JZ': 'JZ A, x - Jump to A if register x == 0',
-            'JNZ': 'JNZ A, x - Jump to A if register x != 0'
-        }
-        hover_text = instruction_descriptions.get(word, f'Assembly instruction: {word}')
-    
-    if hover_text:
-        return Hover(
-            contents=MarkupContent(
-                kind=MarkupKind.Markdown,
-                value=f"**{word}**\n\n{hover_text}"
-            ),
-            range=Range(
-                start=Position(line=position.line, character=word_start),
-                end=Position(line=position.line, character=word_end)
-            )
-        )
+    if body is None:
+        body = mcl_server._hover_bodies.get(word)
+    if not body:
+        return None
     
-    return None
+    result = Hover(
+        contents=MarkupContent(
+            kind=MarkupKind.Markdown,
+            value=body
+        ),
+        range=mcl_server.to_client_range(lines, Range(
+            start=Position(line=position.line, character=word_start),
+            end=Position(line=position.line, character=word_end)
+        ))
+    )
+    mcl_server._last_hover = (document_uri, position.line, word_start, word_end, result)
+    return result
 
 
 @mcl_server.feature(TEXT_DOCUMENT_SEMANTIC_TOKENS_FULL)
 async def semantic_tokens(params: SemanticTokensParams) -> SemanticTokens:
     """Provide semantic tokens for syntax highlighting."""
     document_uri = params.text_document.uri
+    await mcl_server.wait_for_edits(document_uri)
     
-    if document_uri not in mcl_server.documents:
+    text = mcl_server.get_text(document_uri)
+    if not text or text.isspace():
         return SemanticTokens(data=[])
     
-    text = mcl_server.documents[document_uri]
-    
     try:
-        tokens = tokenize(text)
-        semantic_data = []
+        tokens = await mcl_server.get_tokens(document_uri, text)
+        # Five packed unsigned ints per token, written in place; trimmed to
+        # size at the end
+        semantic_data = array.array('I', [0]) * (5 * len(tokens))
+        j = 0
+        types = mcl_server.types
+        token_type_idx_of = _TOKEN_TYPE_IDX.get
         
         prev_line = 0
         prev_char = 0
         
         for token in tokens:
-            if token.type == TokenType.EOF:
+            token_type = token.type
+            if token_type == _EOF_TOKEN:
                 continue
             
             # Calculate relative position
             delta_line = token.line - 1 - prev_line  # Convert to 0-based
             delta_char = token.column - 1 - (prev_char if delta_line == 0 else 0)
             
-            # Determine token type
-            token_type_idx = 0  # Default to keyword
-            token_modifiers = 0
-            
-            if token.type in [TokenType.VAR, TokenType.IF, TokenType.ELSE, TokenType.ELIF,
-                            TokenType.WHILE, TokenType.FOR, TokenType.SWITCH, TokenType.CASE,
-                            TokenType.DEFAULT, TokenType.FUNCTION, TokenType.RETURN,
-                            TokenType.BREAK, TokenType.CONTINUE]:
-                token_type_idx = 0  # Keyword
-            
-            elif token.type == TokenType.IDENTIFIER:
+            # Determine token type (anything unclassified defaults to keyword)
+            if token_type == _IDENTIFIER_TOKEN:
                 # Determine if it's a function, variable, etc.
-                if token.value in mcl_server.types:
-                    token_type_idx = 1  # Type
-                else:
-                    token_type_idx = 2  # Variable (default)
-            
-            elif token.type == TokenType.INTEGER:
-                token_type_idx = 4  # Number
-            
-            elif token.type == TokenType.CHAR:
-                token_type_idx = 5  # String (character)
-            
-            elif token.type == TokenType.COMMENT:
-                token_type_idx = 6  # Comment
-            
-            elif token.type in [TokenType.PLUS, TokenType.MINUS, TokenType.MULTIPLY,
-                              TokenType.DIVIDE, TokenType.MODULO, TokenType.ASSIGN,
-                              TokenType.EQUALS, TokenType.NOT_EQUALS, TokenType.LESS_THAN,
-                              TokenType.GREATER_THAN, TokenType.LESS_EQUAL,
-                              TokenType.GREATER_EQUAL, TokenType.LOGICAL_AND,
-                              TokenType.LOGICAL_OR, TokenType.LOGICAL_NOT,
-                              TokenType.BITWISE_AND, TokenType.BITWISE_OR,
-                              TokenType.BITWISE_XOR, TokenType.BITWISE_NOT,
-                              TokenType.SHIFT_LEFT, TokenType.SHIFT_RIGHT]:
-                token_type_idx = 7  # Operator
+                token_type_idx = 1 if token.value in types else 2  # Type / Variable
+            else:
+                token_type_idx = token_type_idx_of(token_type, 0)
             
-            # Add semantic token data
-            semantic_data.extend([
-                delta_line,
-                delta_char,
-                len(token.value),
-                token_type_idx,
-                token_modifiers
-            ])
+            # Add semantic token data (modifiers stay 0)
+            semantic_data[j] = delta_line
+            semantic_data[j + 1] = delta_char
+            semantic_data[j + 2] = len(token.value)
+            semantic_data[j + 3] = token_type_idx
+            j += 5
             
             prev_line = token.line - 1
             prev_char = token.column - 1
         
+        del semantic_data[j:]
         return SemanticTokens(data=semantic_data)
     
-    except Exception:
-        # If tokenization fails, return empty tokens
+    except (LexerError, AttributeError, OverflowError):
+        # If tokenization fails (or a token position cannot be encoded),
+        # return empty tokens
         return SemanticTokens(data=[])
 
 
@@ -440,32 +645,48 @@ async def diagnostics(params: DocumentDiagnosticParams) -> FullDocumentDiagnosti
     """Provide diagnostics (errors, warnings)."""
     document_uri = params.text_document.uri
     
-    if document_uri not in mcl_server.documents:
+    await mcl_server.wait_for_edits(document_uri)
+    
+    text = mcl_server.get_text(document_uri)
+    if not text or text.isspace():
         return FullDocumentDiagnosticReport(kind="full", items=[])
     
-    text = mcl_server.documents[document_uri]
+    # Unchanged since the last run (or a run in progress): reuse that report
+    digest = _digest(text)
+    cached = mcl_server._diag_cache.get(document_uri)
+    if cached is None or cached[0] != digest:
+        report = asyncio.ensure_future(_compute_diagnostics(document_uri, text))
+        cached = mcl_server._diag_cache[document_uri] = (digest, report)
+    
+    try:
+        # Shielded so a cancelled pull does not cancel a run other pulls share
+        return await asyncio.shield(cached[1])
+    except Exception:
+        # Don't keep serving a failed run
+        if mcl_server._diag_cache.get(document_uri) is cached:
+            del mcl_server._diag_cache[document_uri]
+        raise
+
+
+def _first_line_length(document_uri: str, text: str) -> int:
+    """Length of a document's first line in the client's position units."""
+    first_line = text.split('\n', 1)[0]
+    return mcl_server.workspace.position_codec.client_num_units(first_line)
+
+
+async def _compute_diagnostics(document_uri: str, text: str) -> FullDocumentDiagnosticReport:
+    """Run the compiler pipeline over a document and collect its errors."""
     diagnostic_items = []
     
     try:
-        # Run the preprocessor first (use a dummy base dir since we have no real path)
-        from pathlib import Path
-        import re
-        # Extract a plausible base dir from the URI (file:// scheme)
-        base_dir = Path('.')
-        if document_uri.startswith('file://'):
-            raw = document_uri[7:]
-            # On Windows URIs look like file:///C:/path/to/file.mcl
-            raw = raw.lstrip('/')
-            try:
-                base_dir = Path(raw).parent
-            except Exception:
-                pass
+        # Run the preprocessor first, resolving includes against the document's directory
+        base_dir = mcl_server.base_dirs.get(document_uri, Path('.'))
         
         try:
-            expanded_text = preprocess(text, base_dir)
+            expanded_text = await mcl_server.run_cpu(preprocess, text, base_dir)
         except PreprocessorError as e:
             # Extract line number from error message if available
-            m = re.search(r':(\d+):', str(e))
+            m = _ERR_LINE_RE.search(str(e))
             err_line = int(m.group(1)) - 1 if m else 0
             diagnostic_items.append(Diagnostic(
                 range=Range(
@@ -477,25 +698,23 @@ async def diagnostics(params: DocumentDiagnosticParams) -> FullDocumentDiagnosti
                 source="mcl-preprocessor"
             ))
             return FullDocumentDiagnosticReport(kind="full", items=diagnostic_items)
-    except Exception:
-        expanded_text = text  # fall back to raw text on any unexpected error
+    except (OSError, UnicodeDecodeError):
+        expanded_text = text  # fall back to raw text if an include can't be read
     
     try:
-        # Try to tokenize and parse
-        tokens = tokenize(expanded_text)
-        
         try:
-            ast = parse(tokens)
+            # Tokenize and parse (lexer errors propagate to the outer handler)
+            ast = await mcl_server.get_ast(document_uri, expanded_text)
             
             try:
                 # Try to generate assembly to catch semantic errors
-                generate_assembly(ast)
+                await mcl_server.run_cpu(generate_assembly, ast)
             except CodeGenerationError as e:
                 # Semantic error
                 diagnostic_items.append(Diagnostic(
                     range=Range(
                         start=Position(line=0, character=0),
-                        end=Position(line=0, character=len(text.split('\n')[0]) if text else 0)
+                        end=Position(line=0, character=_first_line_length(document_uri, text))
                     ),
                     message=str(e),
                     severity=DiagnosticSeverity.Error,
@@ -544,37 +763,33 @@ async def diagnostics(params: DocumentDiagnosticParams) -> FullDocumentDiagnosti
 @mcl_server.feature("textDocument/didOpen")
 async def did_open(params: DidOpenTextDocumentParams):
     """Handle document open event."""
+    # pygls has already stored the text in mcl_server.workspace
     document_uri = params.text_document.uri
-    text = params.text_document.text
-    mcl_server.documents[document_uri] = text
+    mcl_server._forget_hover(document_uri)
+    mcl_server.base_dirs[document_uri] = _base_dir_from_uri(document_uri)
 
 
 @mcl_server.feature("textDocument/didChange")
 async def did_change(params: DidChangeTextDocumentParams):
     """Handle document change event."""
+    # pygls has already applied the edits to mcl_server.workspace
     document_uri = params.text_document.uri
-    
-    for change in params.content_changes:
-        if hasattr(change, 'text'):
-            # Full document update
-            mcl_server.documents[document_uri] = change.text
-        elif hasattr(change, 'range'):
-            # Incremental update (not implemented yet)
-            pass
+    mcl_server._forget_hover(document_uri)
+    mcl_server.debounce(document_uri)
 
 
 @mcl_server.feature("textDocument/didSave")
 async def did_save(params: DidSaveTextDocumentParams):
     """Handle document save event."""
-    pass  # Could trigger compilation here
+    # The saved file may be #included by other open documents, whose cached
+    # reports would then be stale
+    mcl_server._diag_cache.clear()
 
 
 @mcl_server.feature("textDocument/didClose")
 async def did_close(params: DidCloseTextDocumentParams):
     """Handle document close event."""
-    document_uri = params.text_document.uri
-    if document_uri in mcl_server.documents:
-        del mcl_server.documents[document_uri]
+    mcl_server.close_document(params.text_document.uri)
 
 
 @mcl_server.feature("initialize")
@@ -582,7 +797,7 @@ async def initialize(params: InitializeParams) -> InitializeResult:
     """Initialize the language server."""
     return InitializeResult(
         capabilities=ServerCapabilities(
-            text_document_sync=TextDocumentSyncKind.Full,
+            text_document_sync=TextDocumentSyncKind.Incremental,
             completion_provider=CompletionOptions(trigger_characters=[".", ":"]),
             hover_provider=HoverOptions(),
             semantic_tokens_provider=SemanticTokensOptions(
@@ -3,9 +3,9 @@
 Loads and parses assembly files into executable instructions.
 """
 
-from typing import List, Dict, Tuple, Optional
-import re
-from .cpu import Instruction
+import sys
+from typing import Dict, Iterable, List, Optional, Tuple
+from .cpu import Instruction, _INT_RE
 
 
 class AssemblyLoaderError(Exception):
@@ -13,6 +13,150 @@ class AssemblyLoaderError(Exception):
     pass
 
 
+def _preprocess_line(line: str) -> str:
+    """Preprocess a line by removing comments and whitespace.
+    
+    Args:
+        line: Raw line from assembly file
+    
+    Returns:
+        Processed line, or empty string if line should be skipped
+    """
+    # Remove comments ('//' or ';' to end of line)
+    comment_pos = line.find('//')
+    if comment_pos >= 0:
+        line = line[:comment_pos]
+    comment_pos = line.find(';')
+    if comment_pos >= 0:
+        line = line[:comment_pos]
+    
+    # Strip whitespace
+    line = line.strip()
+    
+    # Skip empty lines
+    if not line:
+        return ""
+    
+    return line
+
+
+def _parse_instruction(line: str, address: int) -> Instruction:
+    """Parse a single instruction line.
+    
+    Args:
+        line: Instruction line (without label)
+        address: Address of this instruction
+    
+    Returns:
+        Parsed Instruction object
+    """
+    # Split off the opcode; everything after it is the operand list
+    parts = line.split(None, 1)
+    if not parts:
+        raise AssemblyLoaderError("Empty instruction")
+    
+    # Opcodes repeat heavily; share one string object per mnemonic
+    opcode = sys.intern(parts[0].upper())
+    
+    # Parse operands
+    operands = []
+    if len(parts) > 1:
+        for op in parts[1].split(','):
+            op = op.strip()
+            if op:
+                operands.append(_parse_operand(op))
+    
+    return Instruction(opcode, operands, address)
+
+
+def _parse_operand(operand: str) -> str:
+    """Parse a single operand.
+    
+    Args:
+        operand: Raw operand string
+    
+    Returns:
+        Parsed operand
+    
+    Rules:
+    - i:123 = immediate decimal value
+    - 0x123 = immediate hex value (no i: needed)
+    - 123 = register number (raw decimals are always registers)
+    - label = label reference
+    """
+    operand = operand.strip()
+    
+    # Handle decimal numbers (treated as register numbers); checked
+    # first as the most common operand form
+    if operand.isdecimal():
+        return operand
+    
+    # Handle explicit immediate values (i:123 or i:0xFF)
+    if operand.startswith('i:'):
+        return operand
+    
+    # Handle labels/identifiers (ASCII only, matching label definitions)
+    if operand.isidentifier() and operand.isascii():
+        return sys.intern(operand)
+    
+    # Handle hexadecimal values (treated as immediates without i: prefix)
+    if operand.startswith(('0x', '0X')):
+        return operand
+    
+    # Signed or digit-grouped decimals are still register numbers; _INT_RE
+    # accepts exactly what int() does, as the CPU expects at decode
+    if _INT_RE.match(operand):
+        return operand
+    
+    raise AssemblyLoaderError(f"Invalid operand: {operand}")
+
+
+def _load(lines: Iterable[str]) -> Tuple[List[Instruction], Dict[str, int]]:
+    """Parse assembly source lines into instructions and label addresses.
+    
+    Args:
+        lines: Source lines, in order
+    
+    Returns:
+        Tuple of (instructions, labels)
+    """
+    labels: Dict[str, int] = {}
+    instructions: List[Instruction] = []
+    append = instructions.append
+    
+    # Single pass: an instruction's address is its index in the output,
+    # so a label simply records how many instructions precede it
+    for line_num, line in enumerate(lines, 1):
+        try:
+            # Remove '//' and ';' comments and whitespace (inlined _preprocess_line)
+            comment_pos = line.find('//')
+            if comment_pos >= 0:
+                line = line[:comment_pos]
+            comment_pos = line.find(';')
+            line = (line[:comment_pos] if comment_pos >= 0 else line).strip()
+            if not line:
+                continue
+            
+            # Handle labels: an ASCII identifier before the first ':'
+            colon_pos = line.find(':')
+            if colon_pos > 0:
+                label_name = line[:colon_pos]
+                if label_name.isidentifier() and label_name.isascii():
+                    labels[sys.intern(label_name)] = len(instructions)
+                    
+                    # Check if there's an instruction after the label
+                    line = line[colon_pos + 1:].strip()
+                    if not line:
+                        continue
+            
+            append(_parse_instruction(line, len(instructions)))
+        
+        except Exception as e:
+            raise AssemblyLoaderError(f"Error on line {line_num}: {e}")
+    
+    return instructions, labels
+
+
 class AssemblyLoader:
     """Loads assembly code into executable instructions."""
     
@@ -29,10 +173,12 @@ class AssemblyLoader:
         Returns:
             Tuple of (instructions, labels)
         """
+        # Stream lines straight into the parser rather than reading the
+        # whole file into memory first
         with open(filename, 'r', encoding='utf-8') as f:
-            content = f.read()
+            self.instructions, self.labels = _load(f)
         
-        return self.load_from_string(content)
+        return self.instructions, self.labels
     
     def load_from_string(self, assembly_code: str) -> Tuple[List[Instruction], Dict[str, int]]:
         """Load assembly from string.
@@ -43,164 +189,13 @@ class AssemblyLoader:
         Returns:
             Tuple of (instructions, labels)
         """
-        self.labels.clear()
-        self.instructions.clear()
-        
-        lines = assembly_code.strip().split('\n')
-        current_address = 0
-        
-        # First pass: collect labels
-        for line_num, line in enumerate(lines, 1):
-            try:
-                processed_line = self._preprocess_line(line)
-                if not processed_line:
-                    continue
-                
-                # Check for label
-                if ':' in processed_line and not processed_line.strip().startswith('//'):
-                    label_match = re.match(r'^([a-zA-Z_][a-zA-Z0-9_]*):(.*)$', processed_line)
-                    if label_match:
-                        label_name = label_match.group(1)
-                        self.labels[label_name] = current_address
-                        
-                        # Check if there's an instruction after the label
-                        remaining = label_match.group(2).strip()
-                        if remaining and not remaining.startswith('//'):
-                            current_address += 1
-                    else:
-                        current_address += 1
-                else:
-                    current_address += 1
-            
-            except Exception as e:
-                raise AssemblyLoaderError(f"Error on line {line_num}: {e}")
-        
-        # Second pass: parse instructions
-        current_address = 0
-        for line_num, line in enumerate(lines, 1):
-            try:
-                processed_line = self._preprocess_line(line)
-                if not processed_line:
-                    continue
-                
-                # Handle labels
-                if ':' in processed_line:
-                    label_match = re.match(r'^([a-zA-Z_][a-zA-Z0-9_]*):(.*)$', processed_line)
-                    if label_match:
-                        remaining = label_match.group(2).strip()
-                        if remaining and not remaining.startswith('//'):
-                            instruction = self._parse_instruction(remaining, current_address)
-                            self.instructions.append(instruction)
-                            current_address += 1
-                    else:
-                        instruction = self._parse_instruction(processed_line, current_address)
-                        self.instructions.append(instruction)
-                        current_address += 1
-                else:
-                    instruction = self._parse_instruction(processed_line, current_address)
-                    self.instructions.append(instruction)
-                    current_address += 1
-            
-            except Exception as e:
-                raise AssemblyLoaderError(f"Error on line {line_num}: {e}")
-        
-        return self.instructions.copy(), self.labels.copy()
-    
-    def _preprocess_line(self, line: str) -> str:
-        """Preprocess a line by removing comments and whitespace.
-        
-        Args:
-            line: Raw line from assembly file
-        
-        Returns:
-            Processed line, or empty string if line should be skipped
-        """
-        # Remove comments
-        comment_pos = line.find('//')
-        if comment_pos >= 0:
-            line = line[:comment_pos]
-        
-        # Strip whitespace
-        line = line.strip()
-        
-        # Skip empty lines
-        if not line:
-            return ""
-        
-        return line
-    
-    def _parse_instruction(self, line: str, address: int) -> Instruction:
-        """Parse a single instruction line.
-        
-        Args:
-            line: Instruction line (without label)
-            address: Address of this instruction
-        
-        Returns:
-            Parsed Instruction object
-        """
-        # Split instruction and operands
-        parts = line.split()
-        if not parts:
-            raise AssemblyLoaderError("Empty instruction")
-        
-        opcode = parts[0].upper()
-        
-        # Parse operands
-        operands = []
-        if len(parts) > 1:
-            # Join remaining parts and split by comma
-            operand_str = ' '.join(parts[1:])
-            # Remove inline comments before parsing operands
-            comment_pos = operand_str.find(';')
-            if comment_pos >= 0:
-                operand_str = operand_str[:comment_pos]
-            
-            operand_parts = [op.strip() for op in operand_str.split(',')]
-            
-            for op in operand_parts:
-                if op:
-                    operands.append(self._parse_operand(op))
-        
-        return Instruction(opcode, operands, address)
+        self.instructions, self.labels = _load(assembly_code.splitlines())
+        return self.instructions, self.labels
     
-    def _parse_operand(self, operand: str) -> str:
-        """Parse a single operand.
-        
-        Args:
-            operand: Raw operand string
-        
-        Returns:
-            Parsed operand
-        
-        Rules:
-        - i:123 = immediate decimal value
-        - 0x123 = immediate hex value (no i: needed)
-        - 123 = register number (raw decimals are always registers)
-        - label = label reference
-        """
-        operand = operand.strip()
-        
-        # Handle explicit immediate values (i:123 or i:0xFF)
-        if operand.startswith('i:'):
-            return operand
-        
-        # Handle hexadecimal values (treated as immediates without i: prefix)
-        if operand.startswith('0x') or operand.startswith('0X'):
-            return operand
-        
-        # Handle decimal numbers (treated as register numbers)
-        try:
-            int(operand)
-            return operand  # Raw decimal = register number
-        except ValueError:
-            pass
-        
-        # Handle labels/identifiers
-        if re.match(r'^[a-zA-Z_][a-zA-Z0-9_]*$', operand):
-            return operand
-        
-        raise AssemblyLoaderError(f"Invalid operand: {operand}")
+    # Parsing helpers, kept as methods for existing callers
+    _preprocess_line = staticmethod(_preprocess_line)
+    _parse_instruction = staticmethod(_parse_instruction)
+    _parse_operand = staticmethod(_parse_operand)
 
 
 def load_assembly_file(filename: str) -> Tuple[List[Instruction], Dict[str, int]]:
@@ -212,8 +207,8 @@ def load_assembly_file(filename: str) -> Tuple[List[Instruction], Dict[str, int]
     Returns:
         Tuple of (instructions, labels)
     """
-    loader = AssemblyLoader()
-    return loader.load_from_file(filename)
+    with open(filename, 'r', encoding='utf-8') as f:
+        return _load(f)
 
 
 def load_assembly_string(assembly_code: str) -> Tuple[List[Instruction], Dict[str, int]]:
@@ -225,5 +220,4 @@ def load_assembly_string(assembly_code: str) -> Tuple[List[Instruction], Dict[st
     Returns:
         Tuple of (instructions, labels)
     """
-    loader = AssemblyLoader()
-    return loader.load_from_string(assembly_code)
\ No newline at end of file
+    return _load(assembly_code.splitlines())
@@ -3,10 +3,12 @@
 Simulates the CPU with registers and instruction execution.
 """
 
-from dataclasses import dataclass
-from typing import Dict, List, Optional, Callable, Any
+from dataclasses import dataclass, replace
+from typing import Dict, List, Optional, Callable, Any, Set, Tuple
 from enum import Enum
+import re
 import struct
+import sys
 
 
 class CPUException(Exception):
@@ -32,7 +34,32 @@ class CPUState(Enum):
     BREAKPOINT = "breakpoint"
 
 
-@dataclass
+# Integer tags mirroring CPUState, for cheap comparisons in polling loops
+STATE_RUNNING = 0
+STATE_STOPPED = 1
+STATE_ERROR = 2
+STATE_BREAKPOINT = 3
+
+_STATE_TAGS = {
+    CPUState.RUNNING: STATE_RUNNING,
+    CPUState.STOPPED: STATE_STOPPED,
+    CPUState.ERROR: STATE_ERROR,
+    CPUState.BREAKPOINT: STATE_BREAKPOINT,
+}
+# CPUState values indexed by tag
+_STATE_VALUES = tuple(state.value for state in sorted(_STATE_TAGS, key=_STATE_TAGS.get))
+
+# Fixed part of a binary state snapshot: pc, instruction_count, cycle_count,
+# state tag; the 16-bit registers follow (see CPU.get_state_bytes)
+_SNAPSHOT_HEADER = struct.Struct('<IQQB')
+
+
+# One Instruction exists per program line, so drop the per-instance __dict__
+# where dataclasses support it (Python 3.10+)
+_SLOTS = {'slots': True} if sys.version_info >= (3, 10) else {}
+
+
+@dataclass(**_SLOTS)
 class Instruction:
     """Represents a decoded instruction."""
     opcode: str
@@ -41,14 +68,78 @@ class Instruction:
     raw_data: Any = None
 
 
+# Opcode numbering for decoded instructions; OP_INVALID marks instructions
+# that failed to decode
+OPCODES = (
+    'LOAD', 'READ', 'MVR', 'MVM',
+    'ADD', 'SUB', 'MULT', 'DIV', 'SHL', 'SHR', 'SHLR', 'AND', 'OR', 'XOR', 'NOT',
+    'JMP', 'JAL', 'JBT', 'JZ', 'JNZ',
+    'KEYIN', 'HALT',
+    'DRLINE', 'DRGRD', 'CLRGRID', 'LDSPR', 'DRSPR', 'LDTXT', 'DRTXT', 'SCRLBFR',
+)
+OPCODE_IDS = {opcode: op_id for op_id, opcode in enumerate(OPCODES)}
+OP_INVALID = len(OPCODES)
+
+
+# Special register indices (module level so handlers read them as globals)
+RETURN_VALUE_REG = 0
+SECONDARY_RETURN_REG = 1
+STACK_POINTER_REG = 2
+FRAME_POINTER_REG = 3
+RETURN_ADDRESS_REG = 2  # Written by JAL
+
+
+# Strings int() accepts in base 10 and base 16 (whitespace here is what
+# int() strips: str.isspace() minus the \x1c-\x1f separators)
+_INT_RE = re.compile(r'[^\S\x1c-\x1f]*[+-]?\d+(?:_\d+)*[^\S\x1c-\x1f]*\Z')
+_HEX_RE = re.compile(
+    r'[^\S\x1c-\x1f]*[+-]?(?:0[xX]_?)?[\da-fA-F]+(?:_[\da-fA-F]+)*[^\S\x1c-\x1f]*\Z')
+
+
+# Operand kinds of a DecodedInstruction (labels are resolved to KIND_IMM)
+KIND_IMM = 0  # Immediate value
+KIND_REG = 1  # General-purpose register index
+KIND_GPU = 2  # GPU special register
+
+
+@dataclass(**_SLOTS)
+class DecodedInstruction:
+    """An instruction with its handler and operands resolved ahead of time.
+
+    Built once per program by CPU.decode_program so that executing an
+    instruction does no string parsing. Each operand is a (kind, value) pair,
+    see the KIND_* constants.
+    """
+    handler: Callable
+    instruction: Instruction
+    op_id: int = OP_INVALID
+    op0_kind: int = KIND_IMM
+    op0_val: Any = 0
+    op1_kind: int = KIND_IMM
+    op1_val: Any = 0
+    op2_kind: int = KIND_IMM
+    op2_val: Any = 0
+    # All operands as (kind, value) pairs
+    operands: Tuple[Tuple[int, Any], ...] = ()
+    # Error found while decoding, raised when the instruction executes
+    error: Optional[Exception] = None
+    # Number of instructions executed; 2 for a fused pair (see CPU._fuse_program)
+    count: int = 1
+    # Second instruction of a fused pair
+    fused: Optional['DecodedInstruction'] = None
+
+
 class CPU:
     """MCL Virtual Machine CPU."""
     
     # Special register indices
-    RETURN_VALUE_REG = 0
-    SECONDARY_RETURN_REG = 1
-    STACK_POINTER_REG = 2
-    FRAME_POINTER_REG = 3
+    RETURN_VALUE_REG = RETURN_VALUE_REG
+    SECONDARY_RETURN_REG = SECONDARY_RETURN_REG
+    STACK_POINTER_REG = STACK_POINTER_REG
+    FRAME_POINTER_REG = FRAME_POINTER_REG
+    
+    # KEYIN input ring buffer size; a power of two so positions wrap with a mask
+    INPUT_BUFFER_SIZE = 256
     
     # Special named registers (outside 0-31 range)
     SPECIAL_REGISTERS = {
@@ -68,6 +159,7 @@ class CPU:
         
         # Registers (16-bit integers)
         self.registers = [0] * num_registers
+        self._register_struct = struct.Struct(f'<{num_registers}H')
         
         # Program counter
         self.pc = 0
@@ -81,7 +173,10 @@ class CPU:
         self.cycle_count = 0
         
         # Input buffer for KEYIN instruction
-        self.input_buffer = [0] * 256  # Ring buffer for input
+        if self.INPUT_BUFFER_SIZE & (self.INPUT_BUFFER_SIZE - 1):
+            raise ValueError("INPUT_BUFFER_SIZE must be a power of two")
+        self.input_buffer = [0] * self.INPUT_BUFFER_SIZE  # Ring buffer for input
+        self._input_mask = self.INPUT_BUFFER_SIZE - 1
         self.input_write_pos = 0  # Where new input is written
         self.input_read_pos = 0   # Where KEYIN reads from
         
@@ -122,6 +217,86 @@ class CPU:
             'DRTXT': self._exec_gpu,
             'SCRLBFR': self._exec_gpu,
         }
+        
+        # Operand decoders, by opcode (see decode_program)
+        self.instruction_decoders = {
+            'LOAD': self._decode_load,
+            'READ': self._decode_read,
+            'MVR': self._decode_mvr,
+            'MVM': self._decode_mvm,
+            'NOT': self._decode_not,
+            'JMP': self._decode_jmp,
+            'JAL': self._decode_jal,
+            'JBT': self._decode_jbt,
+            'JZ': self._decode_conditional_jump,
+            'JNZ': self._decode_conditional_jump,
+            'KEYIN': self._decode_keyin,
+            'HALT': self._decode_halt,
+        }
+        for opcode in ('ADD', 'SUB', 'MULT', 'DIV', 'SHL', 'SHR', 'AND', 'OR', 'XOR'):
+            self.instruction_decoders[opcode] = self._decode_alu
+        self.instruction_decoders['SHLR'] = self._decode_shlr
+        for opcode, handler in self.instruction_handlers.items():
+            if handler == self._exec_gpu:
+                self.instruction_decoders[opcode] = self._decode_gpu
+        
+        # Handlers indexed by opcode id (see OPCODES)
+        self.dispatch_table: List[Callable] = [
+            self.instruction_handlers[opcode] for opcode in OPCODES
+        ] + [self._exec_invalid]
+        
+        # Memory instruction handlers specialised by operand kinds
+        self._load_handlers = {
+            (KIND_IMM, KIND_IMM): self._exec_load_imm_imm,
+            (KIND_IMM, KIND_REG): self._exec_load_imm_reg,
+            (KIND_REG, KIND_IMM): self._exec_load_reg_imm,
+            (KIND_REG, KIND_REG): self._exec_load_reg_reg,
+        }
+        self._read_handlers = {
+            KIND_IMM: self._exec_read_imm,
+            KIND_REG: self._exec_read_reg,
+        }
+        self._mvm_handlers = {
+            (KIND_IMM, KIND_IMM): self._exec_mvm_imm_imm,
+            (KIND_IMM, KIND_REG): self._exec_mvm_imm_reg,
+            (KIND_REG, KIND_IMM): self._exec_mvm_reg_imm,
+            (KIND_REG, KIND_REG): self._exec_mvm_reg_reg,
+        }
+        # Handlers for an ALU instruction and the branch after it, used by run()
+        self._fused_handlers = {
+            (OPCODE_IDS['ADD'], OPCODE_IDS['JZ']): self._exec_add_jz,
+            (OPCODE_IDS['ADD'], OPCODE_IDS['JNZ']): self._exec_add_jnz,
+            (OPCODE_IDS['ADD'], OPCODE_IDS['JBT']): self._exec_add_jbt,
+            (OPCODE_IDS['SUB'], OPCODE_IDS['JZ']): self._exec_sub_jz,
+            (OPCODE_IDS['SUB'], OPCODE_IDS['JNZ']): self._exec_sub_jnz,
+            (OPCODE_IDS['SUB'], OPCODE_IDS['JBT']): self._exec_sub_jbt,
+        }
+        # SHLR handlers with an immediate rotate count baked in, indexed by count
+        self._shlr_imm_handlers = [self._make_shlr_imm(count) for count in range(16)]
+        
+        # Pre-decoded program, rebuilt whenever memory.program is replaced
+        self.decoded_program: List[DecodedInstruction] = []
+        # decoded_program with ALU/branch pairs fused
+        self._fused_program: List[DecodedInstruction] = []
+        # _fused_program with breakpoints patched in; what run() executes
+        self._run_program: List[DecodedInstruction] = []
+        self.breakpoints: Set[int] = set()
+        self._decoded_source: Optional[List[Instruction]] = None
+        # Value operand -> (kind, value), valid for the decoded program's labels
+        self._operand_cache: Dict[Any, Tuple[int, Any]] = {}
+        # Operand string -> _resolve_operand result, with the same lifetime
+        self._resolved_operands: Dict[str, Any] = {}
+    
+    @property
+    def state(self) -> CPUState:
+        """Current execution state."""
+        return self._state
+    
+    @state.setter
+    def state(self, value: CPUState) -> None:
+        self._state = value
+        # Plain int copy of the state (see STATE_* constants)
+        self.state_int = _STATE_TAGS[value]
     
     def reset(self) -> None:
         """Reset CPU to initial state."""
@@ -137,8 +312,8 @@ class CPU:
         # Handle named registers
         if isinstance(reg_id, str):
             if reg_id in self.SPECIAL_REGISTERS:
-                if reg_id == 'GPU' and self.gpu:
-                    return self.gpu.get_gpu_register()
+                if reg_id == 'GPU':
+                    return self._get_gpu_register()
                 return 0  # Default for unimplemented special registers
             else:
                 raise CPUException(f"Unknown special register: {reg_id}")
@@ -153,9 +328,8 @@ class CPU:
         # Handle named registers
         if isinstance(reg_id, str):
             if reg_id in self.SPECIAL_REGISTERS:
-                if reg_id == 'GPU' and self.gpu:
-                    # Always mask GPU register to 32 bits
-                    self.gpu.set_gpu_register(value & 0xFFFFFFFF)
+                if reg_id == 'GPU':
+                    self._set_gpu_register(value)
                 return
             else:
                 raise CPUException(f"Unknown special register: {reg_id}")
@@ -167,6 +341,18 @@ class CPU:
         else:
             raise CPUException(f"Invalid register: {reg_id}")
     
+    def _get_gpu_register(self) -> int:
+        """Get the GPU control register (0 when no GPU is attached)."""
+        if self.gpu:
+            return self.gpu.get_gpu_register()
+        return 0
+    
+    def _set_gpu_register(self, value: int) -> None:
+        """Set the GPU control register (ignored when no GPU is attached)."""
+        if self.gpu:
+            # Always mask GPU register to 32 bits
+            self.gpu.set_gpu_register(value & 0xFFFFFFFF)
+    
     def _to_16bit_unsigned(self, value: int) -> int:
         """Convert value to 16-bit unsigned integer."""
         return value & 0xFFFF
@@ -174,16 +360,18 @@ class CPU:
     def add_input_char(self, char_code: int) -> None:
         """Add character to input buffer."""
         self.input_buffer[self.input_write_pos] = char_code
-        self.input_write_pos = (self.input_write_pos + 1) % len(self.input_buffer)
+        self.input_write_pos = (self.input_write_pos + 1) & self._input_mask
     
     def set_labels(self, labels: Dict[str, int]) -> None:
         """Set labels dictionary for jump resolution."""
         self.labels = labels.copy()
+        # Label targets are resolved at decode time
+        self.decode_program()
     
     def backspace_input(self) -> None:
         """Handle backspace in input buffer."""
         if self.input_write_pos != self.input_read_pos:
-            self.input_write_pos = (self.input_write_pos - 1) % len(self.input_buffer)
+            self.input_write_pos = (self.input_write_pos - 1) & self._input_mask
     
     def read_input_char(self) -> int:
         """Read next character from input buffer for KEYIN instruction."""
@@ -191,7 +379,7 @@ class CPU:
             return 0  # No input available
         
         char_code = self.input_buffer[self.input_read_pos]
-        self.input_read_pos = (self.input_read_pos + 1) % len(self.input_buffer)
+        self.input_read_pos = (self.input_read_pos + 1) & self._input_mask
         return char_code
     
     def _blocking_read_input_char(self) -> int:
@@ -202,7 +390,7 @@ class CPU:
             # Check if input is available
             if self.input_read_pos != self.input_write_pos:
                 char_code = self.input_buffer[self.input_read_pos]
-                self.input_read_pos = (self.input_read_pos + 1) % 256
+                self.input_read_pos = (self.input_read_pos + 1) & self._input_mask
                 return char_code
             
             # No input available - update display to process events and wait
@@ -252,36 +440,40 @@ class CPU:
         if isinstance(operand, int):
             return operand
         
+        resolved = self._resolved_operands.get(operand)
+        if resolved is None:
+            resolved = self._resolved_operands[operand] = self._parse_operand(operand)
+        return resolved
+    
+    def _parse_operand(self, operand: str):
+        """Parse an operand for _resolve_operand, without caching."""
         operand_str = str(operand)
         
         # Immediate value (prefixed with 'i:')
         if operand_str.startswith('i:'):
             value_str = operand_str[2:]
             if value_str.startswith('0x'):
-                try:
+                if _HEX_RE.match(value_str):
                     return int(value_str, 16)
-                except ValueError:
-                    # Not a valid hex, treat as label
-                    return self.memory.resolve_label(value_str)
-            try:
-                return int(value_str)
-            except ValueError:
-                # Not a valid int, treat as label
+                # Not a valid hex, treat as label
                 return self.memory.resolve_label(value_str)
+            if _INT_RE.match(value_str):
+                return int(value_str)
+            # Not a valid int, treat as label
+            return self.memory.resolve_label(value_str)
         
         # Hexadecimal
         if operand_str.startswith('0x'):
             return int(operand_str, 16)
         
         # Register or memory address
-        try:
+        if _INT_RE.match(operand_str):
             return int(operand_str)
-        except ValueError:
-            # Check for special named registers before resolving as label
-            if operand_str in self.SPECIAL_REGISTERS:
-                return operand_str  # Return the name for special handling
-            # Label - resolve through memory/program
-            return self.memory.resolve_label(operand_str)
+        # Check for special named registers before resolving as label
+        if operand_str in self.SPECIAL_REGISTERS:
+            return operand_str  # Return the name for special handling
+        # Label - resolve through memory/program
+        return self.memory.resolve_label(operand_str)
     
     def step(self) -> bool:
         """Execute one instruction.
@@ -293,15 +485,20 @@ class CPU:
             return False
         
         try:
+            # Decode the program on first use after it was (re)loaded
+            if self.memory.program is not self._decoded_source:
+                self.decode_program()
+            
             # Fetch instruction
-            instruction = self.memory.fetch_instruction(self.pc)
-            if instruction is None:
+            pc = self.pc
+            if not 0 <= pc < len(self.decoded_program):
                 self.state = CPUState.STOPPED
                 self.halt_reason = "End of program"
                 return False
+            decoded = self.decoded_program[pc]
             
-            # Decode and execute
-            self._execute_instruction(instruction)
+            # Execute; handlers return the next PC
+            self.pc = decoded.handler(decoded, pc)
             
             # Update counters
             self.instruction_count += 1
@@ -317,219 +514,530 @@ class CPU:
     def run(self, max_cycles: Optional[int] = None) -> None:
         """Run CPU until halted or max cycles reached."""
         self.state = CPUState.RUNNING
+        if self.memory.program is not self._decoded_source:
+            self.decode_program()
         
-        cycles = 0
-        while self.state == CPUState.RUNNING:
-            if max_cycles and cycles >= max_cycles:
-                self.state = CPUState.STOPPED
-                self.halt_reason = "Max cycles reached"
-                break
-            
+        # Resuming from a breakpoint: execute its instruction before checking again
+        if self.pc in self.breakpoints:
             if not self.step():
-                break
-            
-            cycles += 1
+                return
+            if max_cycles:
+                max_cycles -= 1
+                if not max_cycles:
+                    self.state = CPUState.STOPPED
+                    self.halt_reason = "Max cycles reached"
+                    return
+        
+        # Same fetch/execute sequence as step(), with the lookups hoisted
+        program = self._run_program
+        program_size = len(program)
+        pc = self.pc
+        cycles = 0
+        try:
+            while self.state_int == STATE_RUNNING:
+                if max_cycles and cycles >= max_cycles:
+                    self.state = CPUState.STOPPED
+                    self.halt_reason = "Max cycles reached"
+                    break
+                
+                if not 0 <= pc < program_size:
+                    self.state = CPUState.STOPPED
+                    self.halt_reason = "End of program"
+                    break
+                decoded = program[pc]
+                if max_cycles and cycles + decoded.count > max_cycles:
+                    # No room for the whole fused pair; run its first instruction
+                    decoded = self.decoded_program[pc]
+                pc = decoded.handler(decoded, pc)
+                
+                cycles += decoded.count
+        except Exception as e:
+            self.state = CPUState.ERROR
+            self.halt_reason = str(e)
+            raise
+        finally:
+            # The PC lives in a local while running
+            self.pc = pc
+            self.instruction_count += cycles
+            self.cycle_count += cycles
     
     def _execute_instruction(self, instruction: Instruction) -> None:
-        """Execute a decoded instruction."""
-        handler = self.instruction_handlers.get(instruction.opcode.upper())
-        if not handler:
-            raise InvalidInstructionException(f"Unknown instruction: {instruction.opcode}")
+        """Decode and execute a single instruction."""
+        decoded = self.decode_instruction(instruction)
+        self.pc = decoded.handler(decoded, self.pc)
+    
+    # Instruction decoding
+    
+    def decode_program(self) -> None:
+        """Pre-decode memory.program into decoded_program."""
+        program = self.memory.program
+        self._operand_cache = {}
+        self._resolved_operands = {}
+        self.decoded_program = [self.decode_instruction(instr) for instr in program]
+        self._fused_program = self._fuse_program(self.decoded_program)
+        self._patch_breakpoints()
+        self._decoded_source = program
+    
+    def decode_instruction(self, instruction: Instruction) -> DecodedInstruction:
+        """Resolve an instruction's handler and operands.
+        
+        Malformed instructions still decode; the error is raised when the
+        instruction executes, as it would have been without decoding.
+        """
+        try:
+            # The assembly loader already uppercases opcodes
+            opcode = instruction.opcode
+            op_id = OPCODE_IDS.get(opcode)
+            if op_id is None:
+                opcode = opcode.upper()
+                op_id = OPCODE_IDS.get(opcode)
+            if op_id is None:
+                raise InvalidInstructionException(f"Unknown instruction: {instruction.opcode}")
+            return self.instruction_decoders[opcode](instruction, op_id)
+        except Exception as e:
+            return DecodedInstruction(self._exec_invalid, instruction, error=e)
+    
+    def _fuse_program(self, program: List[DecodedInstruction]) -> List[DecodedInstruction]:
+        """Fuse each ADD/SUB followed by JZ, JNZ or JBT into one record.
         
-        # Execute instruction
-        handler(instruction)
+        The fused record replaces the ALU instruction and does the work of
+        both; the branch keeps its own record so it can still be jumped to.
+        Only pairs of register and immediate operands are fused, since those
+        cannot raise part way through.
+        """
+        fused_program = list(program)
+        for pc in range(len(program) - 1):
+            first, second = program[pc], program[pc + 1]
+            handler = self._fused_handlers.get((first.op_id, second.op_id))
+            if handler is None:
+                continue
+            kinds = (first.op0_kind, first.op1_kind, second.op1_kind, second.op2_kind)
+            if KIND_GPU in kinds:
+                continue
+            fused_program[pc] = replace(first, handler=handler, count=2, fused=second)
+        return fused_program
+    
+    def _patch_breakpoints(self) -> None:
+        """Rebuild the program run() executes from _fused_program.
+        
+        Each instruction with a breakpoint is swapped for a record that
+        stops the CPU, so run() pays nothing per cycle for breakpoints.
+        """
+        program = self._fused_program
+        if self.breakpoints:
+            program = list(program)
+            for address in self.breakpoints:
+                if not 0 <= address < len(program):
+                    continue
+                program[address] = DecodedInstruction(
+                    self._exec_breakpoint, self.decoded_program[address].instruction, count=0)
+                # A fused pair must not run through the breakpoint
+                if address > 0 and program[address - 1].count == 2:
+                    program[address - 1] = self.decoded_program[address - 1]
+        self._run_program = program
+    
+    def _decoded(self, instr: Instruction, op_id: int, *operands: Tuple[int, Any],
+                 handler: Optional[Callable] = None) -> DecodedInstruction:
+        """Build the DecodedInstruction for instr from its decoded operands.
         
-        # Advance PC (unless it was modified by the instruction)
-        if instruction.opcode.upper() not in ['JMP', 'JAL', 'JBT', 'JZ', 'JNZ']:
-            self.pc += 1
+        handler overrides the opcode's entry in dispatch_table, for handlers
+        specialised on operand kinds.
+        """
+        fields = [part for operand in operands[:3] for part in operand]
+        return DecodedInstruction(handler or self.dispatch_table[op_id], instr, op_id,
+                                  *fields, operands=operands)
+    
+    def _check_operand_count(self, instr: Instruction, count: int) -> None:
+        """Raise if instr does not have exactly count operands."""
+        if len(instr.operands) != count:
+            plural = 's' if count != 1 else ''
+            raise InvalidInstructionException(
+                f"{instr.opcode.upper()} requires {count} operand{plural}")
+    
+    def _classify_operand(self, operand) -> Tuple[int, Any]:
+        """Classify a value operand, caching the result per operand."""
+        classified = self._operand_cache.get(operand)
+        if classified is None:
+            classified = self._operand_cache[operand] = self._decode_value(operand)
+        return classified
+    
+    def _decode_value(self, operand) -> Tuple[int, Any]:
+        """Classify an operand read as a value (see _get_operand_value)."""
+        if str(operand).startswith('i:'):
+            _, str_data = operand.split(':', 1)
+            address = self.memory.labels.get(str_data)
+            if address is not None:
+                return KIND_IMM, address
+            return KIND_IMM, self._resolve_operand(operand)
+        if str(operand).startswith('0x'):
+            return KIND_IMM, int(operand, 16)
+        if operand in self.SPECIAL_REGISTERS:
+            # Named register (like 'GPU')
+            return KIND_GPU, operand
+        # A register number or a label; malformed numbers already fell
+        # through to label lookup in _resolve_operand
+        resolved = self._resolve_operand(operand)
+        # Numeric register; validated here rather than on every read
+        if not 0 <= resolved < len(self.registers):
+            raise CPUException(f"Invalid register: {resolved}")
+        return KIND_REG, resolved
+    
+    def _decode_address(self, operand, error: str) -> Tuple[int, Any]:
+        """Classify a LOAD/READ/MVM operand (immediate or register)."""
+        if operand.startswith('i:'):
+            return KIND_IMM, self._resolve_operand(operand)
+        if str(operand).startswith('0x'):
+            return KIND_IMM, int(operand, 16)
+        if not _INT_RE.match(operand):
+            raise CPUException(f"{error}: {operand}")
+        reg_num = int(operand)
+        if not 0 <= reg_num < len(self.registers):
+            raise CPUException(f"Invalid register: {reg_num}")
+        return KIND_REG, reg_num
+    
+    def _decode_destination(self, operand, allow_special: bool = False) -> Tuple[int, Any]:
+        """Classify a destination register operand."""
+        dest_reg_str = str(operand)
+        if _INT_RE.match(dest_reg_str):
+            dest_reg = int(dest_reg_str)
+            if not (0 <= dest_reg < len(self.registers)):
+                raise CPUException(f"Invalid destination register: {dest_reg}")
+            return KIND_REG, dest_reg
+        if allow_special and dest_reg_str in self.SPECIAL_REGISTERS:
+            return KIND_GPU, dest_reg_str
+        raise CPUException(f"Invalid destination register: {dest_reg_str}")
+    
+    def _decode_load(self, instr: Instruction, op_id: int) -> DecodedInstruction:
+        self._check_operand_count(instr, 2)
+        value = self._decode_address(instr.operands[0], "Invalid source operand")
+        address = self._decode_address(instr.operands[1], "Invalid destination address operand")
+        handler = self._load_handlers[value[0], address[0]]
+        return self._decoded(instr, op_id, value, address, handler=handler)
+    
+    def _decode_read(self, instr: Instruction, op_id: int) -> DecodedInstruction:
+        self._check_operand_count(instr, 2)
+        if str(instr.operands[1]).startswith('i:'):
+            raise CPUException("READ destination cannot be immediate value")
+        address = self._decode_address(instr.operands[0], "Invalid RAM address operand")
+        dest = self._decode_destination(instr.operands[1])
+        handler = self._read_handlers[address[0]]
+        return self._decoded(instr, op_id, address, dest, handler=handler)
+    
+    def _decode_mvr(self, instr: Instruction, op_id: int) -> DecodedInstruction:
+        self._check_operand_count(instr, 2)
+        if str(instr.operands[1]).startswith('i:'):
+            raise CPUException("MVR destination cannot be immediate value")
+        value = self._classify_operand(instr.operands[0])
+        dest = self._decode_destination(instr.operands[1], allow_special=True)
+        return self._decoded(instr, op_id, value, dest)
+    
+    def _decode_mvm(self, instr: Instruction, op_id: int) -> DecodedInstruction:
+        self._check_operand_count(instr, 2)
+        src = self._decode_address(instr.operands[0], "Invalid source address operand")
+        dst = self._decode_address(instr.operands[1], "Invalid destination address operand")
+        handler = self._mvm_handlers[src[0], dst[0]]
+        return self._decoded(instr, op_id, src, dst, handler=handler)
+    
+    def _decode_alu(self, instr: Instruction, op_id: int) -> DecodedInstruction:
+        self._check_operand_count(instr, 2)
+        a = self._classify_operand(instr.operands[0])
+        b = self._classify_operand(instr.operands[1])
+        return self._decoded(instr, op_id, a, b)
+    
+    def _decode_shlr(self, instr: Instruction, op_id: int) -> DecodedInstruction:
+        decoded = self._decode_alu(instr, op_id)
+        if decoded.op1_kind == KIND_IMM:
+            decoded.handler = self._shlr_imm_handlers[decoded.op1_val % 16]
+        return decoded
+    
+    def _decode_not(self, instr: Instruction, op_id: int) -> DecodedInstruction:
+        self._check_operand_count(instr, 1)
+        # NOT should only work on registers, not immediate values
+        operand = instr.operands[0]
+        if operand.startswith('i:'):
+            raise InvalidInstructionException("NOT operand cannot be immediate value")
+        # Handle both 'r:N' and 'N' formats
+        if operand.startswith('r:'):
+            reg_num = int(operand[2:])
+        else:
+            reg_num = int(operand)
+        self.get_register(reg_num)
+        return self._decoded(instr, op_id, (KIND_REG, reg_num))
+    
+    def _decode_jmp(self, instr: Instruction, op_id: int) -> DecodedInstruction:
+        self._check_operand_count(instr, 1)
+        operand = instr.operands[0]
+        if operand.startswith('i:'):
+            # Immediate address
+            target = (KIND_IMM, self._resolve_operand(operand))
+        elif operand.isdigit() or (operand.startswith('r:') and operand[2:].isdigit()):
+            # Register - use register's value as address
+            if operand.startswith('r:'):
+                reg_num = int(operand[2:])
+            else:
+                reg_num = int(operand)
+            self.get_register(reg_num)
+            target = (KIND_REG, reg_num)
+        else:
+            # Label - resolve through memory
+            target = (KIND_IMM, self._resolve_operand(operand))
+        if target[0] == KIND_IMM:
+            # Address known now; the handler just returns it
+            return self._decoded(instr, op_id, target, handler=self._exec_jmp_imm)
+        return self._decoded(instr, op_id, target)
+    
+    def _decode_jal(self, instr: Instruction, op_id: int) -> DecodedInstruction:
+        self._check_operand_count(instr, 1)
+        try:
+            target = self._resolve_operand(instr.operands[0])
+        except Exception as e:
+            # The return address is stored before the target is resolved
+            return DecodedInstruction(self._exec_jal_unresolved, instr, op_id, error=e)
+        return self._decoded(instr, op_id, (KIND_IMM, target))
+    
+    def _decode_jbt(self, instr: Instruction, op_id: int) -> DecodedInstruction:
+        self._check_operand_count(instr, 3)
+        target = self._resolve_operand(instr.operands[0])
+        x = self._classify_operand(instr.operands[1])
+        y = self._classify_operand(instr.operands[2])
+        return self._decoded(instr, op_id, (KIND_IMM, target), x, y)
+    
+    def _decode_conditional_jump(self, instr: Instruction, op_id: int) -> DecodedInstruction:
+        self._check_operand_count(instr, 2)
+        target = self._resolve_operand(instr.operands[0])
+        x = self._classify_operand(instr.operands[1])
+        return self._decoded(instr, op_id, (KIND_IMM, target), x)
+    
+    def _decode_keyin(self, instr: Instruction, op_id: int) -> DecodedInstruction:
+        self._check_operand_count(instr, 1)
+        address = self._resolve_operand(instr.operands[0])
+        return self._decoded(instr, op_id, (KIND_IMM, address))
+    
+    def _decode_halt(self, instr: Instruction, op_id: int) -> DecodedInstruction:
+        return self._decoded(instr, op_id)
+    
+    def _decode_gpu(self, instr: Instruction, op_id: int) -> DecodedInstruction:
+        # Operands are never read when no GPU is attached
+        operands = ()
+        if self.gpu is not None:
+            operands = tuple(self._classify_operand(operand) for operand in instr.operands)
+        return self._decoded(instr, op_id, *operands)
+    
+    def _read_operand(self, kind: int, value) -> int:
+        """Read a decoded operand."""
+        if kind == KIND_REG:
+            return self.registers[value]
+        if kind == KIND_IMM:
+            return value
+        # KIND_GPU; 'GPU' is the only named register
+        return self._get_gpu_register()
     
     # Instruction implementations
     
-    def _exec_load(self, instr: Instruction) -> None:
+    def _exec_invalid(self, instr: DecodedInstruction, pc: int) -> int:
+        """Raise the error found while decoding the instruction."""
+        raise instr.error
+    
+    def _exec_breakpoint(self, instr: DecodedInstruction, pc: int) -> int:
+        """Stop at a breakpoint without executing the instruction."""
+        self.state = CPUState.BREAKPOINT
+        return pc
+    
+    def _exec_load(self, instr: DecodedInstruction, pc: int) -> int:
         """LOAD A, B - Load value A into RAM address B
         A can be immediate (i:value), hex (0x...), or register for value
         B can be immediate (i:addr), hex (0x...), or register for address
         """
-        if len(instr.operands) != 2:
-            raise InvalidInstructionException("LOAD requires 2 operands")
-        
-        # Get value to store (first operand)
-        if instr.operands[0].startswith('i:'):
-            # Immediate value - use the value directly
-            value = self._resolve_operand(instr.operands[0])
-        elif str(instr.operands[0]).startswith('0x'):
-            # Hex immediate value
-            value = int(instr.operands[0], 16)
-        else:
-            # Register - use the register's value
-            try:
-                reg_num = int(instr.operands[0])
-                value = self.get_register(reg_num)
-            except ValueError:
-                raise CPUException(f"Invalid source operand: {instr.operands[0]}")
-        
-        # Get RAM address (second operand)
-        if instr.operands[1].startswith('i:'):
-            # Immediate address - use the address directly
-            ram_addr = self._resolve_operand(instr.operands[1])
-        elif str(instr.operands[1]).startswith('0x'):
-            # Hex immediate address
-            ram_addr = int(instr.operands[1], 16)
-        else:
-            # Register - use the register's value as address
-            try:
-                reg_num = int(instr.operands[1])
-                ram_addr = self.get_register(reg_num)
-            except ValueError:
-                raise CPUException(f"Invalid destination address operand: {instr.operands[1]}")
-        
+        value = self._read_operand(instr.op0_kind, instr.op0_val)
+        ram_addr = self._read_operand(instr.op1_kind, instr.op1_val)
         self.memory.write(ram_addr, value)
+        return pc + 1
     
-    def _exec_read(self, instr: Instruction) -> None:
+    def _exec_read(self, instr: DecodedInstruction, pc: int) -> int:
         """READ A, B - Load data at RAM address A into register B
         A can be immediate (i:addr), hex (0x...), or register for address
         B must be a register number (cannot be immediate)
         """
-        if len(instr.operands) != 2:
-            raise InvalidInstructionException("READ requires 2 operands")
-        
-        # Validate destination is not immediate
-        if str(instr.operands[1]).startswith('i:'):
-            raise CPUException("READ destination cannot be immediate value")
-        
-        # Get RAM address (first operand)
-        if instr.operands[0].startswith('i:'):
-            # Immediate address - use the address directly
-            ram_addr = self._resolve_operand(instr.operands[0])
-        elif str(instr.operands[0]).startswith('0x'):
-            # Hex immediate address
-            ram_addr = int(instr.operands[0], 16)
-        else:
-            # Register - use the register's value as address
-            try:
-                reg_num = int(instr.operands[0])
-                ram_addr = self.get_register(reg_num)
-            except ValueError:
-                raise CPUException(f"Invalid RAM address operand: {instr.operands[0]}")
-        
-        # Get destination register (second operand)
-        try:
-            dest_reg = int(instr.operands[1])
-            if not (0 <= dest_reg < len(self.registers)):
-                raise CPUException(f"Invalid destination register: {dest_reg}")
-        except ValueError:
-            raise CPUException(f"Invalid destination register: {instr.operands[1]}")
-        
+        ram_addr = self._read_operand(instr.op0_kind, instr.op0_val)
         value = self.memory.read(ram_addr)
-        self.set_register(dest_reg, value)
+        self.registers[instr.op1_val] = value & 0xFFFF
+        return pc + 1
     
-    def _exec_mvr(self, instr: Instruction) -> None:
+    def _exec_mvr(self, instr: DecodedInstruction, pc: int) -> int:
         """MVR A, B - Move value to register
         A can be immediate (i:value), hex (0x...), or register
         B must be a register (cannot be immediate)
         """
-        if len(instr.operands) != 2:
-            raise InvalidInstructionException("MVR requires 2 operands")
-
-        # Validate destination is not immediate
-        if str(instr.operands[1]).startswith('i:'):
-            raise CPUException("MVR destination cannot be immediate value")
-
-        # Use the robust _get_operand_value for the source
-        value = self._get_operand_value(instr.operands[0])
-
-        # Get destination register (second operand)
-        try:
-            dst_reg = int(instr.operands[1])
-            if not (0 <= dst_reg < len(self.registers)):
-                raise CPUException(f"Invalid destination register: {dst_reg}")
-        except ValueError:
-            # Handle special named registers like 'GPU'
-            dst_reg_str = str(instr.operands[1])
-            if dst_reg_str in self.SPECIAL_REGISTERS:
-                dst_reg = dst_reg_str
-            else:
-                raise CPUException(f"Invalid destination register: {dst_reg_str}")
-
-        self.set_register(dst_reg, value)
+        value = self._read_operand(instr.op0_kind, instr.op0_val)
+        if instr.op1_kind == KIND_REG:
+            self.registers[instr.op1_val] = value & 0xFFFF
+        else:
+            self._set_gpu_register(value)
+        return pc + 1
     
-    def _exec_mvm(self, instr: Instruction) -> None:
+    def _exec_mvm(self, instr: DecodedInstruction, pc: int) -> int:
         """MVM A, B - Copy RAM address A to RAM address B
         A can be immediate (i:addr), hex (0x...), or register for address
         B can be immediate (i:addr), hex (0x...), or register for address
         """
-        if len(instr.operands) != 2:
-            raise InvalidInstructionException("MVM requires 2 operands")
-        
-        # Get source address (first operand)
-        if instr.operands[0].startswith('i:'):
-            src_addr = self._resolve_operand(instr.operands[0])
-        elif str(instr.operands[0]).startswith('0x'):
-            src_addr = int(instr.operands[0], 16)
-        else:
-            try:
-                reg_num = int(instr.operands[0])
-                src_addr = self.get_register(reg_num)
-            except ValueError:
-                raise CPUException(f"Invalid source address operand: {instr.operands[0]}")
-        
-        # Get destination address (second operand)
-        if instr.operands[1].startswith('i:'):
-            dst_addr = self._resolve_operand(instr.operands[1])
-        elif str(instr.operands[1]).startswith('0x'):
-            dst_addr = int(instr.operands[1], 16)
-        else:
-            try:
-                reg_num = int(instr.operands[1])
-                dst_addr = self.get_register(reg_num)
-            except ValueError:
-                raise CPUException(f"Invalid destination address operand: {instr.operands[1]}")
-        
+        src_addr = self._read_operand(instr.op0_kind, instr.op0_val)
+        dst_addr = self._read_operand(instr.op1_kind, instr.op1_val)
         value = self.memory.read(src_addr)
         self.memory.write(dst_addr, value)
+        return pc + 1
+    
+    # LOAD/READ/MVM specialised on operand kinds (immediate or register),
+    # selected when the instruction is decoded
+    
+    def _exec_load_imm_imm(self, instr: DecodedInstruction, pc: int) -> int:
+        self.memory.write(instr.op1_val, instr.op0_val)
+        return pc + 1
+    
+    def _exec_load_imm_reg(self, instr: DecodedInstruction, pc: int) -> int:
+        self.memory.write(self.registers[instr.op1_val], instr.op0_val)
+        return pc + 1
+    
+    def _exec_load_reg_imm(self, instr: DecodedInstruction, pc: int) -> int:
+        self.memory.write(instr.op1_val, self.registers[instr.op0_val])
+        return pc + 1
     
-    def _exec_add(self, instr: Instruction) -> None:
+    def _exec_load_reg_reg(self, instr: DecodedInstruction, pc: int) -> int:
+        registers = self.registers
+        self.memory.write(registers[instr.op1_val], registers[instr.op0_val])
+        return pc + 1
+    
+    def _exec_read_imm(self, instr: DecodedInstruction, pc: int) -> int:
+        self.registers[instr.op1_val] = self.memory.read(instr.op0_val) & 0xFFFF
+        return pc + 1
+    
+    def _exec_read_reg(self, instr: DecodedInstruction, pc: int) -> int:
+        registers = self.registers
+        registers[instr.op1_val] = self.memory.read(registers[instr.op0_val]) & 0xFFFF
+        return pc + 1
+    
+    def _exec_mvm_imm_imm(self, instr: DecodedInstruction, pc: int) -> int:
+        memory = self.memory
+        memory.write(instr.op1_val, memory.read(instr.op0_val))
+        return pc + 1
+    
+    def _exec_mvm_imm_reg(self, instr: DecodedInstruction, pc: int) -> int:
+        memory = self.memory
+        memory.write(self.registers[instr.op1_val], memory.read(instr.op0_val))
+        return pc + 1
+    
+    def _exec_mvm_reg_imm(self, instr: DecodedInstruction, pc: int) -> int:
+        memory = self.memory
+        memory.write(instr.op1_val, memory.read(self.registers[instr.op0_val]))
+        return pc + 1
+    
+    def _exec_mvm_reg_reg(self, instr: DecodedInstruction, pc: int) -> int:
+        memory = self.memory
+        registers = self.registers
+        memory.write(registers[instr.op1_val], memory.read(registers[instr.op0_val]))
+        return pc + 1
+    
+    def _exec_add(self, instr: DecodedInstruction, pc: int) -> int:
         """ADD A, B - Add A and B, store result in return registers"""
-        if len(instr.operands) != 2:
-            raise InvalidInstructionException("ADD requires 2 operands")
-        
-        a = self._get_operand_value(instr.operands[0])
-        b = self._get_operand_value(instr.operands[1])
+        a = self._read_operand(instr.op0_kind, instr.op0_val)
+        b = self._read_operand(instr.op1_kind, instr.op1_val)
         
-        result = a + b
-        self.set_register(self.RETURN_VALUE_REG, result)
+        self.registers[RETURN_VALUE_REG] = (a + b) & 0xFFFF
+        return pc + 1
     
-    def _exec_sub(self, instr: Instruction) -> None:
+    def _exec_sub(self, instr: DecodedInstruction, pc: int) -> int:
         """SUB A, B - Subtract B from A, store result in return registers"""
-        if len(instr.operands) != 2:
-            raise InvalidInstructionException("SUB requires 2 operands")
+        a = self._read_operand(instr.op0_kind, instr.op0_val)
+        b = self._read_operand(instr.op1_kind, instr.op1_val)
         
-        a = self._get_operand_value(instr.operands[0])
-        b = self._get_operand_value(instr.operands[1])
-        
-        result = a - b
-        self.set_register(self.RETURN_VALUE_REG, result)
+        self.registers[RETURN_VALUE_REG] = (a - b) & 0xFFFF
+        return pc + 1
+    
+    def _exec_add_jz(self, instr: DecodedInstruction, pc: int) -> int:
+        """ADD A, B followed by JZ T, x"""
+        a = self._read_operand(instr.op0_kind, instr.op0_val)
+        b = self._read_operand(instr.op1_kind, instr.op1_val)
+        self.registers[RETURN_VALUE_REG] = (a + b) & 0xFFFF
+        
+        branch = instr.fused
+        if self._read_operand(branch.op1_kind, branch.op1_val) == 0:
+            return branch.op0_val
+        return pc + 2
+    
+    def _exec_add_jnz(self, instr: DecodedInstruction, pc: int) -> int:
+        """ADD A, B followed by JNZ T, x"""
+        a = self._read_operand(instr.op0_kind, instr.op0_val)
+        b = self._read_operand(instr.op1_kind, instr.op1_val)
+        self.registers[RETURN_VALUE_REG] = (a + b) & 0xFFFF
+        
+        branch = instr.fused
+        if self._read_operand(branch.op1_kind, branch.op1_val) != 0:
+            return branch.op0_val
+        return pc + 2
+    
+    def _exec_add_jbt(self, instr: DecodedInstruction, pc: int) -> int:
+        """ADD A, B followed by JBT T, x, y"""
+        a = self._read_operand(instr.op0_kind, instr.op0_val)
+        b = self._read_operand(instr.op1_kind, instr.op1_val)
+        self.registers[RETURN_VALUE_REG] = (a + b) & 0xFFFF
+        
+        branch = instr.fused
+        x = self._read_operand(branch.op1_kind, branch.op1_val)
+        y = self._read_operand(branch.op2_kind, branch.op2_val)
+        if x > y:
+            return branch.op0_val
+        return pc + 2
+    
+    def _exec_sub_jz(self, instr: DecodedInstruction, pc: int) -> int:
+        """SUB A, B followed by JZ T, x"""
+        a = self._read_operand(instr.op0_kind, instr.op0_val)
+        b = self._read_operand(instr.op1_kind, instr.op1_val)
+        self.registers[RETURN_VALUE_REG] = (a - b) & 0xFFFF
+        
+        branch = instr.fused
+        if self._read_operand(branch.op1_kind, branch.op1_val) == 0:
+            return branch.op0_val
+        return pc + 2
+    
+    def _exec_sub_jnz(self, instr: DecodedInstruction, pc: int) -> int:
+        """SUB A, B followed by JNZ T, x"""
+        a = self._read_operand(instr.op0_kind, instr.op0_val)
+        b = self._read_operand(instr.op1_kind, instr.op1_val)
+        self.registers[RETURN_VALUE_REG] = (a - b) & 0xFFFF
+        
+        branch = instr.fused
+        if self._read_operand(branch.op1_kind, branch.op1_val) != 0:
+            return branch.op0_val
+        return pc + 2
     
-    def _exec_mult(self, instr: Instruction) -> None:
+    def _exec_sub_jbt(self, instr: DecodedInstruction, pc: int) -> int:
+        """SUB A, B followed by JBT T, x, y"""
+        a = self._read_operand(instr.op0_kind, instr.op0_val)
+        b = self._read_operand(instr.op1_kind, instr.op1_val)
+        self.registers[RETURN_VALUE_REG] = (a - b) & 0xFFFF
+        
+        branch = instr.fused
+        x = self._read_operand(branch.op1_kind, branch.op1_val)
+        y = self._read_operand(branch.op2_kind, branch.op2_val)
+        if x > y:
+            return branch.op0_val
+        return pc + 2
+    
+    def _exec_mult(self, instr: DecodedInstruction, pc: int) -> int:
         """MULT A, B - Multiply A and B, store result in return registers"""
-        if len(instr.operands) != 2:
-            raise InvalidInstructionException("MULT requires 2 operands")
-        
-        a = self._get_operand_value(instr.operands[0])
-        b = self._get_operand_value(instr.operands[1])
+        a = self._read_operand(instr.op0_kind, instr.op0_val)
+        b = self._read_operand(instr.op1_kind, instr.op1_val)
         
         result = a * b
         # Handle overflow into secondary register (16-bit)
-        self.set_register(self.RETURN_VALUE_REG, result & 0xFFFF)
-        self.set_register(self.SECONDARY_RETURN_REG, (result >> 16) & 0xFFFF)
+        registers = self.registers
+        registers[RETURN_VALUE_REG] = result & 0xFFFF
+        registers[SECONDARY_RETURN_REG] = (result >> 16) & 0xFFFF
+        return pc + 1
     
-    def _exec_div(self, instr: Instruction) -> None:
+    def _exec_div(self, instr: DecodedInstruction, pc: int) -> int:
         """DIV A, B - Divide A by B, store result in return registers"""
-        if len(instr.operands) != 2:
-            raise InvalidInstructionException("DIV requires 2 operands")
-        
-        a = self._get_operand_value(instr.operands[0])
-        b = self._get_operand_value(instr.operands[1])
+        a = self._read_operand(instr.op0_kind, instr.op0_val)
+        b = self._read_operand(instr.op1_kind, instr.op1_val)
         
         if b == 0:
             raise CPUException("Division by zero")
@@ -542,198 +1050,134 @@ class CPU:
         quotient = int(a_signed / b_signed)
         remainder = a_signed - quotient * b_signed
         
-        self.set_register(self.RETURN_VALUE_REG, quotient & 0xFFFF)
-        self.set_register(self.SECONDARY_RETURN_REG, remainder & 0xFFFF)
+        registers = self.registers
+        registers[RETURN_VALUE_REG] = quotient & 0xFFFF
+        registers[SECONDARY_RETURN_REG] = remainder & 0xFFFF
+        return pc + 1
     
-    def _exec_shl(self, instr: Instruction) -> None:
+    def _exec_shl(self, instr: DecodedInstruction, pc: int) -> int:
         """SHL A, B - Shift A left by B bits"""
-        if len(instr.operands) != 2:
-            raise InvalidInstructionException("SHL requires 2 operands")
+        a = self._read_operand(instr.op0_kind, instr.op0_val)
+        b = self._read_operand(instr.op1_kind, instr.op1_val)
         
-        a = self._get_operand_value(instr.operands[0])
-        b = self._get_operand_value(instr.operands[1])
-        
-        if str(instr.operands[0]) == 'GPU':
-            result = (a << b) & 0xFFFFFFFF
-        else:
-            result = (a << b) & 0xFFFF
-        self.set_register(self.RETURN_VALUE_REG, result)
+        # Registers are 16 bits wide, even when shifting the 32-bit GPU register
+        self.registers[RETURN_VALUE_REG] = (a << b) & 0xFFFF
+        return pc + 1
     
-    def _exec_shr(self, instr: Instruction) -> None:
+    def _exec_shr(self, instr: DecodedInstruction, pc: int) -> int:
         """SHR A, B - Shift A right by B bits"""
-        if len(instr.operands) != 2:
-            raise InvalidInstructionException("SHR requires 2 operands")
+        a = self._read_operand(instr.op0_kind, instr.op0_val)
+        b = self._read_operand(instr.op1_kind, instr.op1_val)
         
-        a = self._get_operand_value(instr.operands[0])
-        b = self._get_operand_value(instr.operands[1])
-        
-        if str(instr.operands[0]) == 'GPU':
-            result = (a >> b) & 0xFFFFFFFF
-        else:
-            result = (a >> b) & 0xFFFF
-        self.set_register(self.RETURN_VALUE_REG, result)
+        # Registers are 16 bits wide, even when shifting the 32-bit GPU register
+        self.registers[RETURN_VALUE_REG] = (a >> b) & 0xFFFF
+        return pc + 1
     
-    def _exec_shlr(self, instr: Instruction) -> None:
+    def _exec_shlr(self, instr: DecodedInstruction, pc: int) -> int:
         """SHLR A, B - Shift A left rotate by B bits"""
-        if len(instr.operands) != 2:
-            raise InvalidInstructionException("SHLR requires 2 operands")
-        
-        a = self._get_operand_value(instr.operands[0])
-        b = self._get_operand_value(instr.operands[1]) % 16
+        a = self._read_operand(instr.op0_kind, instr.op0_val)
+        b = self._read_operand(instr.op1_kind, instr.op1_val) % 16
         
         # 16-bit rotate left
         a = a & 0xFFFF
-        result = ((a << b) | (a >> (16 - b))) & 0xFFFF
-        self.set_register(self.RETURN_VALUE_REG, result)
+        self.registers[RETURN_VALUE_REG] = ((a << b) | (a >> (16 - b))) & 0xFFFF
+        return pc + 1
     
-    def _exec_and(self, instr: Instruction) -> None:
-        """AND A, B - Bitwise AND of A and B"""
-        if len(instr.operands) != 2:
-            raise InvalidInstructionException("AND requires 2 operands")
+    def _make_shlr_imm(self, count: int) -> Callable:
+        """Build an SHLR handler for a fixed rotate count of 0-15 bits."""
+        right = 16 - count
+        read = self._read_operand
         
-        a = self._get_operand_value(instr.operands[0])
-        b = self._get_operand_value(instr.operands[1])
+        def handler(instr: DecodedInstruction, pc: int) -> int:
+            a = read(instr.op0_kind, instr.op0_val) & 0xFFFF
+            self.registers[RETURN_VALUE_REG] = ((a << count) | (a >> right)) & 0xFFFF
+            return pc + 1
         
-        if (str(instr.operands[0]) == 'GPU') or (str(instr.operands[1]) == 'GPU'):
-            result = (a & b) & 0xFFFFFFFF
-        else:
-            result = a & b
-        self.set_register(self.RETURN_VALUE_REG, result)
+        return handler
     
-    def _exec_or(self, instr: Instruction) -> None:
-        """OR A, B - Bitwise OR of A and B"""
-        if len(instr.operands) != 2:
-            raise InvalidInstructionException("OR requires 2 operands")
+    def _exec_and(self, instr: DecodedInstruction, pc: int) -> int:
+        """AND A, B - Bitwise AND of A and B"""
+        a = self._read_operand(instr.op0_kind, instr.op0_val)
+        b = self._read_operand(instr.op1_kind, instr.op1_val)
         
-        a = self._get_operand_value(instr.operands[0])
-        b = self._get_operand_value(instr.operands[1])
+        self.registers[RETURN_VALUE_REG] = (a & b) & 0xFFFF
+        return pc + 1
+    
+    def _exec_or(self, instr: DecodedInstruction, pc: int) -> int:
+        """OR A, B - Bitwise OR of A and B"""
+        a = self._read_operand(instr.op0_kind, instr.op0_val)
+        b = self._read_operand(instr.op1_kind, instr.op1_val)
         
-        if (str(instr.operands[0]) == 'GPU') or (str(instr.operands[1]) == 'GPU'):
-            result = (a | b) & 0xFFFFFFFF
-        else:
-            result = a | b
-        self.set_register(self.RETURN_VALUE_REG, result)
+        self.registers[RETURN_VALUE_REG] = (a | b) & 0xFFFF
+        return pc + 1
     
-    def _exec_xor(self, instr: Instruction) -> None:
+    def _exec_xor(self, instr: DecodedInstruction, pc: int) -> int:
         """XOR A, B - Bitwise XOR of A and B"""
-        if len(instr.operands) != 2:
-            raise InvalidInstructionException("XOR requires 2 operands")
-        
-        a = self._get_operand_value(instr.operands[0])
-        b = self._get_operand_value(instr.operands[1])
+        a = self._read_operand(instr.op0_kind, instr.op0_val)
+        b = self._read_operand(instr.op1_kind, instr.op1_val)
         
-        if (str(instr.operands[0]) == 'GPU') or (str(instr.operands[1]) == 'GPU'):
-            result = (a ^ b) & 0xFFFFFFFF
-        else:
-            result = a ^ b
-        self.set_register(self.RETURN_VALUE_REG, result)
+        self.registers[RETURN_VALUE_REG] = (a ^ b) & 0xFFFF
+        return pc + 1
     
-    def _exec_not(self, instr: Instruction) -> None:
+    def _exec_not(self, instr: DecodedInstruction, pc: int) -> int:
         """NOT A - Bitwise NOT of A"""
-        if len(instr.operands) != 1:
-            raise InvalidInstructionException("NOT requires 1 operand")
-        
-        # NOT should only work on registers, not immediate values
-        operand = instr.operands[0]
-        if operand.startswith('i:'):
-            raise InvalidInstructionException("NOT operand cannot be immediate value")
-            
-        # Handle both 'r:N' and 'N' formats
-        if operand.startswith('r:'):
-            reg_num = int(operand[2:])
-        else:
-            reg_num = int(operand)
-            
-        a = self.get_register(reg_num)
-        
-        result = (~a) & 0xFFFF  # Ensure 16-bit result
-        self.set_register(reg_num, result)
+        registers = self.registers
+        reg_num = instr.op0_val
+        registers[reg_num] = (~registers[reg_num]) & 0xFFFF  # Ensure 16-bit result
+        return pc + 1
     
-    def _exec_jmp(self, instr: Instruction) -> None:
+    def _exec_jmp(self, instr: DecodedInstruction, pc: int) -> int:
         """JMP A - Jump to address A
         If A is immediate (i:addr), jump to that address directly
         If A is register, jump to the address stored in that register
         If A is label, jump to the label's resolved address
         """
-        if len(instr.operands) != 1:
-            raise InvalidInstructionException("JMP requires 1 operand")
-        
-        operand = instr.operands[0]
-        
-        if operand.startswith('i:'):
-            # Immediate address
-            target = self._resolve_operand(operand)
-        elif operand.isdigit() or (operand.startswith('r:') and operand[2:].isdigit()):
-            # Register - use register's value as address
-            if operand.startswith('r:'):
-                reg_num = int(operand[2:])
-            else:
-                reg_num = int(operand)
-            target = self.get_register(reg_num)
-        else:
-            # Label - resolve through memory
-            target = self._resolve_operand(operand)
-            
-        self.pc = target
+        return self._read_operand(instr.op0_kind, instr.op0_val)
     
-    def _exec_jal(self, instr: Instruction) -> None:
+    def _exec_jmp_imm(self, instr: DecodedInstruction, pc: int) -> int:
+        """JMP to an immediate or label address resolved at decode time"""
+        return instr.op0_val
+    
+    def _exec_jal(self, instr: DecodedInstruction, pc: int) -> int:
         """JAL A - Jump to address A and store return address (PC+1) in R2"""
-        if len(instr.operands) != 1:
-            raise InvalidInstructionException("JAL requires 1 operand")
-        
         # Store return address (next instruction) in R2 (return address register)
         # Use R2 instead of SECONDARY_RETURN_REG to avoid conflict with MULT/DIV
-        self.set_register(2, self.pc + 1)
-        
-        target = self._resolve_operand(instr.operands[0])
-        self.pc = target
+        self.registers[RETURN_ADDRESS_REG] = (pc + 1) & 0xFFFF
+        return instr.op0_val
     
-    def _exec_jbt(self, instr: Instruction) -> None:
+    def _exec_jal_unresolved(self, instr: DecodedInstruction, pc: int) -> int:
+        """JAL whose target failed to resolve: store R2, then raise"""
+        self.set_register(RETURN_ADDRESS_REG, pc + 1)
+        raise instr.error
+    
+    def _exec_jbt(self, instr: DecodedInstruction, pc: int) -> int:
         """JBT A, x, y - Jump to A if register x > register y"""
-        if len(instr.operands) != 3:
-            raise InvalidInstructionException("JBT requires 3 operands")
-        
-        target = self._resolve_operand(instr.operands[0])
-        x = self._get_operand_value(instr.operands[1])
-        y = self._get_operand_value(instr.operands[2])
+        x = self._read_operand(instr.op1_kind, instr.op1_val)
+        y = self._read_operand(instr.op2_kind, instr.op2_val)
         
         if x > y:
-            self.pc = target
-        else:
-            self.pc += 1
+            return instr.op0_val
+        return pc + 1
     
-    def _exec_jz(self, instr: Instruction) -> None:
+    def _exec_jz(self, instr: DecodedInstruction, pc: int) -> int:
         """JZ A, x - Jump to A if register x == 0"""
-        if len(instr.operands) != 2:
-            raise InvalidInstructionException("JZ requires 2 operands")
-        
-        target = self._resolve_operand(instr.operands[0])
-        x = self._get_operand_value(instr.operands[1])
+        x = self._read_operand(instr.op1_kind, instr.op1_val)
         
         if x == 0:
-            self.pc = target
-        else:
-            self.pc += 1
+            return instr.op0_val
+        return pc + 1
     
-    def _exec_jnz(self, instr: Instruction) -> None:
+    def _exec_jnz(self, instr: DecodedInstruction, pc: int) -> int:
         """JNZ A, x - Jump to A if register x != 0"""
-        if len(instr.operands) != 2:
-            raise InvalidInstructionException("JNZ requires 2 operands")
-        
-        target = self._resolve_operand(instr.operands[0])
-        x = self._get_operand_value(instr.operands[1])
+        x = self._read_operand(instr.op1_kind, instr.op1_val)
         
         if x != 0:
-            self.pc = target
-        else:
-            self.pc += 1
+            return instr.op0_val
+        return pc + 1
     
-    def _exec_keyin(self, instr: Instruction) -> None:
+    def _exec_keyin(self, instr: DecodedInstruction, pc: int) -> int:
         """KEYIN A - Load system input into address A with blocking behavior"""
-        if len(instr.operands) != 1:
-            raise InvalidInstructionException("KEYIN requires 1 operand")
-        
-        address = self._resolve_operand(instr.operands[0])
+        address = instr.op0_val
         # Prefer input buffer if data has been queued (tests can inject input)
         if self.input_read_pos != self.input_write_pos:
             char_code = self.read_input_char()
@@ -751,69 +1195,86 @@ class CPU:
             self.memory.write(address, char_code)
         except Exception as e:
             raise CPUException(f"KEYIN memory write failed: {e}")
+        return pc + 1
     
-    def _exec_halt(self, instr: Instruction) -> None:
+    def _exec_halt(self, instr: DecodedInstruction, pc: int) -> int:
         """HALT - Stop program execution"""
         self.state = CPUState.STOPPED
         self.halt_reason = "HALT instruction executed"
+        return pc + 1
     
-    def _exec_gpu(self, instr: Instruction) -> None:
+    def _exec_gpu(self, instr: DecodedInstruction, pc: int) -> int:
         """GPU instruction - delegate to GPU unit with immediate value support"""
-        if self.gpu:
-            # Resolve all operands (both immediate and register values)
-            resolved_operands = []
-            for operand in instr.operands:
-                resolved_operands.append(self._get_operand_value(operand))
-            
-            self.gpu.execute_command(instr.opcode, resolved_operands)
-        else:
+        gpu = self.gpu
+        if gpu is None:
             # Ignore GPU commands if no GPU is attached
-            pass
+            return pc + 1
+        
+        # Resolve all operands (both immediate and register values)
+        read = self._read_operand
+        resolved_operands = [read(kind, value) for kind, value in instr.operands]
+        gpu.execute_command(OPCODES[instr.op_id], resolved_operands)
+        return pc + 1
     
     def _get_operand_value(self, operand: str) -> int:
         """Get the value of an operand (register value or immediate)."""
-        if str(operand).startswith('i:'):
-            _, str_data = operand.split(':', 1)
-
-            #Check is str_data is a label referring to another section of assembly code
-            if str_data in self.memory.labels:
-                return self.memory.labels[str_data] 
-            else:
-                # Explicit immediate value
-                return self._resolve_operand(operand)
-        elif str(operand).startswith('0x'):
-            # Hex immediate (no i: prefix needed)
-            return int(operand, 16)
-        else:
-            # Raw decimal - treat as register number
-            try:
-                resolved = self._resolve_operand(operand)
-                if isinstance(resolved, str):
-                    # Named register (like 'GPU')
-                    return self.get_register(resolved)
-                else:
-                    # Numeric register
-                    return self.get_register(resolved)
-            except ValueError:
-                raise CPUException(f"Invalid operand: {operand}")
+        # Labels may have changed if a new program was loaded
+        if self.memory.program is not self._decoded_source:
+            self.decode_program()
+        classified = self._operand_cache.get(operand)
+        if classified is None:
+            classified = self._classify_operand(operand)
+        kind, value = classified
+        # Same dispatch as _read_operand, inlined for the per-step logger
+        if kind == KIND_REG:
+            return self.registers[value]
+        if kind == KIND_IMM:
+            return value
+        # KIND_GPU; 'GPU' is the only named register
+        return self._get_gpu_register()
     
     def get_state(self) -> Dict[str, Any]:
         """Get CPU state for debugging."""
+        # Map the int tag rather than going through the Enum .value descriptor
         return {
             'registers': self.registers.copy(),
             'pc': self.pc,
-            'state': self.state.value,
+            'state': _STATE_VALUES[self.state_int],
             'halt_reason': self.halt_reason,
             'instruction_count': self.instruction_count,
             'cycle_count': self.cycle_count
         }
     
+    def get_state_bytes(self) -> bytes:
+        """Get the CPU state as a compact binary snapshot.
+        
+        Holds the PC, counters, state and registers; halt_reason is not
+        included. Restore it with load_state_bytes.
+        """
+        header = _SNAPSHOT_HEADER.pack(self.pc, self.instruction_count,
+                                       self.cycle_count, self.state_int)
+        return header + self._register_struct.pack(*self.registers)
+    
+    def load_state_bytes(self, data: bytes) -> None:
+        """Restore a snapshot taken by get_state_bytes."""
+        expected = _SNAPSHOT_HEADER.size + self._register_struct.size
+        if len(data) != expected:
+            raise CPUException(f"Invalid state snapshot: {len(data)} bytes, expected {expected}")
+        pc, instruction_count, cycle_count, state_tag = _SNAPSHOT_HEADER.unpack_from(data)
+        if state_tag >= len(_STATE_VALUES):
+            raise CPUException(f"Invalid state snapshot: unknown state {state_tag}")
+        self.registers[:] = self._register_struct.unpack_from(data, _SNAPSHOT_HEADER.size)
+        self.pc = pc
+        self.instruction_count = instruction_count
+        self.cycle_count = cycle_count
+        self.state = CPUState(_STATE_VALUES[state_tag])
+    
     def set_breakpoint(self, address: int) -> None:
-        """Set a breakpoint at the given address."""
-        # This would be implemented in conjunction with the debugger
-        pass
+        """Set a breakpoint at the given address, honoured by run()."""
+        self.breakpoints.add(address)
+        self._patch_breakpoints()
     
     def clear_breakpoint(self, address: int) -> None:
         """Clear a breakpoint at the given address."""
-        # This would be implemented in conjunction with the debugger
-        pass
\ No newline at end of file
+        self.breakpoints.discard(address)
+        self._patch_breakpoints()
\ No newline at end of file
@@ -3,7 +3,7 @@
 Handles RAM, ROM (program memory), and address resolution.
 """
 
-from typing import Dict, List, Optional, Any, Union
+from typing import Dict, List, Optional, Any, Union, Tuple
 from dataclasses import dataclass
 from .cpu import Instruction
 
@@ -64,6 +64,8 @@ class Memory:
         
         # Label to address mapping
         self.labels: Dict[str, int] = {}
+        # Bound lookup; labels is only ever updated in place
+        self._label_address = self.labels.get
         
         # Memory access statistics
         self.read_count = 0
@@ -168,13 +170,14 @@ class Memory:
         Raises:
             MemoryException: If label is not found
         """
-        if label in self.labels:
-            return self.labels[label]
+        address = self._label_address(label)
+        if address is not None:
+            return address
         
         # Try to find function labels
-        func_label = f"func_{label}"
-        if func_label in self.labels:
-            return self.labels[func_label]
+        address = self._label_address(f"func_{label}")
+        if address is not None:
+            return address
         
         raise MemoryException(f"Undefined label: {label}")
     
@@ -226,17 +229,16 @@ class Memory:
         Returns:
             Dictionary mapping addresses to values
         """
-        result = {}
-        ram_region = self.regions['ram']
-        
-        for i in range(count):
-            addr = start + i
-            if 0 <= addr < len(self.ram):
-                result[ram_region.start_address + addr] = self.ram[addr]
-        
-        return result
+        # Clamp to RAM bounds and copy the words with a single slice
+        lo = max(start, 0)
+        hi = min(start + count, len(self.ram))
+        if lo >= hi:
+            return {}
+        
+        base = self.regions['ram'].start_address
+        return dict(zip(range(base + lo, base + hi), self.ram[lo:hi]))
     
-    def dump_program(self, start: int = 0, count: int = 10) -> List[str]:
+    def dump_program(self, start: int = 0, count: int = 10) -> List[Tuple[int, str]]:
         """Dump program instructions for debugging.
         
         Args:
@@ -244,15 +246,12 @@ class Memory:
             count: Number of instructions to dump
         
         Returns:
-            List of instruction strings
+            List of (address, instruction string) tuples
         """
-        result = []
-        
-        for i in range(start, min(start + count, len(self.program))):
-            instr = self.program[i]
-            result.append(f"{i:04d}: {instr}")
-        
-        return result
+        return [
+            (i, str(self.program[i]))
+            for i in range(start, min(start + count, len(self.program)))
+        ]
     
     def clear_ram(self) -> None:
         """Clear all RAM contents."""
@@ -3,7 +3,7 @@
 Main virtual machine that coordinates CPU, memory, and GPU components.
 """
 
-from typing import Dict, List, Optional, Any, Callable
+from typing import Dict, List, Optional, Any, Callable, Tuple
 from pathlib import Path
 import threading
 import time
@@ -13,12 +13,12 @@ import sys
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 try:
-    from .cpu import CPU, CPUState
+    from .cpu import CPU, CPUState, Instruction
     from .memory import Memory
     from .gpu import GPU
     from .assembly_loader import load_assembly_file, load_assembly_string
 except ImportError:
-    from vm.cpu import CPU, CPUState
+    from vm.cpu import CPU, CPUState, Instruction
     from vm.memory import Memory
     from vm.gpu import GPU
     from vm.assembly_loader import load_assembly_file, load_assembly_string
@@ -32,6 +32,9 @@ class VMException(Exception):
 class VirtualMachine:
     """MCL Virtual Machine - coordinates all components."""
     
+    # Maximum number of cached program dumps
+    PROGRAM_DUMP_CACHE_SIZE = 128
+    
     def __init__(self, 
                  ram_size: int = 0x8000,
                  rom_size: int = 0x4000,
@@ -66,11 +69,20 @@ class VirtualMachine:
         self.paused = True  # Start paused by default
         self.execution_thread: Optional[threading.Thread] = None
         
+        # Set whenever execution is not progressing (paused, halted or stopped)
+        self._paused_event = threading.Event()
+        self._paused_event.set()
+        
         # Debugging
         self.breakpoints: set[int] = set()
         self.step_mode = False
         self.debug_callbacks: List[Callable] = []
         
+        # Program dump cache, keyed by (start, count) and valid while
+        # memory.program is still the list it was built from
+        self._program_dump_cache: Dict[Tuple[int, int], Tuple[Tuple[int, str], ...]] = {}
+        self._program_dump_source: Optional[List[Instruction]] = None
+        
         # CPU speed control
         self.cpu_speed = 1.0  # Instructions per second (0.1 to 1000.0)
         self.last_execution_time = 0
@@ -138,6 +150,8 @@ class VirtualMachine:
         
         self.running = True
         # Keep initial paused state (starts paused by default)
+        if not self.paused:
+            self._paused_event.clear()
         self.start_time = time.time()
         
         # Initialize GPU display if enabled
@@ -145,6 +159,7 @@ class VirtualMachine:
             success = self.gpu.initialize_display()
             if not success:
                 print("Failed to initialize display")
+                self._paused_event.set()
                 return
         
         # Run execution loop directly (single-threaded for pygame compatibility)
@@ -158,6 +173,7 @@ class VirtualMachine:
         """Stop VM execution."""
         self.running = False
         self.paused = False
+        self._paused_event.set()
         
         if self.execution_thread and self.execution_thread.is_alive():
             self.execution_thread.join(timeout=1.0)
@@ -170,15 +186,29 @@ class VirtualMachine:
         """Pause VM execution."""
         if self.running:
             self.paused = True
+            self._paused_event.set()
     
     def set_highspeed_mode(self, enabled: bool) -> None:
         """Enable or disable high speed mode (disables timing logic)."""
         self.highspeed_mode = enabled
     
     def resume(self) -> None:
-        """Resume VM execution."""
-        if self.running and self.paused:
+        """Resume VM execution, or let the next start() run unpaused."""
+        if self.paused:
             self.paused = False
+            if self.running:
+                self._paused_event.clear()
+    
+    def wait_until_paused(self, timeout: Optional[float] = None) -> bool:
+        """Block until execution pauses, halts or stops.
+        
+        Args:
+            timeout: Maximum seconds to wait (None waits indefinitely)
+        
+        Returns:
+            True if execution is paused or stopped, False on timeout
+        """
+        return self._paused_event.wait(timeout)
     
     def set_cpu_speed(self, speed: float) -> None:
         """Set CPU execution speed in instructions per second.
@@ -209,6 +239,21 @@ class VirtualMachine:
         
         return success
     
+    def step_many(self, count: int) -> int:
+        """Execute up to count instructions.
+        
+        Args:
+            count: Maximum number of instructions to execute
+        
+        Returns:
+            Number of instructions executed before a halt or breakpoint
+        """
+        step = self.step
+        executed = 0
+        while executed < count and step():
+            executed += 1
+        return executed
+    
     def _execution_loop(self, max_cycles: Optional[int]) -> None:
         """Main execution loop with integrated display updates."""
         self.cpu.state = CPUState.RUNNING
@@ -322,6 +367,7 @@ class VirtualMachine:
                 self.start_time = None
             
             self.running = False
+            self._paused_event.set()
     
     def set_breakpoint(self, address: int) -> None:
         """Set a breakpoint at the given address."""
@@ -394,9 +440,21 @@ class VirtualMachine:
         """Get memory dump for debugging."""
         return self.memory.dump_ram(start, count)
     
-    def get_program_dump(self, start: int = 0, count: int = 10) -> List[str]:
-        """Get program dump for debugging."""
-        return self.memory.dump_program(start, count)
+    def get_program_dump(self, start: int = 0, count: int = 10) -> List[Tuple[int, str]]:
+        """Get program dump as (address, instruction) tuples (cached until the program changes)."""
+        # Loading a program, however it is done, replaces memory.program
+        if self.memory.program is not self._program_dump_source:
+            self._program_dump_cache.clear()
+            self._program_dump_source = self.memory.program
+        key = (start, count)
+        dump = self._program_dump_cache.get(key)
+        if dump is None:
+            if len(self._program_dump_cache) >= self.PROGRAM_DUMP_CACHE_SIZE:
+                self._program_dump_cache.clear()
+            dump = tuple(self.memory.dump_program(start, count))
+            self._program_dump_cache[key] = dump
+        # Callers get their own list so they cannot change the cached entry
+        return list(dump)
     
 
     def _keep_display_open(self, duration: float = 5.0) -> None:
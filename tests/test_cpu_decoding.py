@@ -0,0 +1,122 @@
+"""
+Tests for the CPU's pre-decoded instruction cache.
+"""
+
+import unittest
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.vm.virtual_machine import create_vm
+from src.vm.assembly_loader import load_assembly_string, AssemblyLoaderError
+from src.vm.cpu import CPUState, KIND_IMM, KIND_REG
+from src.vm.memory import MemoryException
+
+
+class TestCPUDecoding(unittest.TestCase):
+    """Test instruction pre-decoding."""
+    
+    def setUp(self):
+        self.vm = create_vm({'enable_gpu': False})
+        self.cpu = self.vm.cpu
+    
+    def run_program(self, max_cycles=100):
+        self.cpu.run(max_cycles)
+    
+    def test_operands_resolved_at_load(self):
+        """Labels and immediates are resolved when the program is loaded."""
+        self.vm.load_program_string("start:\nADD 4, i:0x10\nJNZ start, 0\nHALT")
+        add, jnz, _ = self.cpu.decoded_program
+        self.assertEqual((add.op0_kind, add.op0_val), (KIND_REG, 4))
+        self.assertEqual((add.op1_kind, add.op1_val), (KIND_IMM, 16))
+        self.assertEqual((jnz.op0_kind, jnz.op0_val), (KIND_IMM, 0))
+        # Handlers return the next PC
+        self.assertEqual(add.handler(add, 5), 6)
+        self.assertEqual(self.cpu.registers[0], 16)
+        self.assertEqual(jnz.handler(jnz, 5), 0)
+        self.cpu.registers[0] = 0
+        self.assertEqual(jnz.handler(jnz, 5), 6)
+    
+    def test_shlr_immediate_count(self):
+        """SHLR with an immediate count matches the general rotate."""
+        for count in (0, 1, 4, 15, 16, 17):
+            self.vm.load_program_string(f"SHLR i:0x8001, i:{count}\nHALT")
+            shlr = self.cpu.decoded_program[0]
+            self.assertIsNot(shlr.handler, self.cpu.dispatch_table[shlr.op_id])
+            self.cpu.reset()
+            self.run_program()
+            shift = count % 16
+            expected = ((0x8001 << shift) | (0x8001 >> (16 - shift))) & 0xFFFF
+            self.assertEqual(self.cpu.registers[0], expected)
+    
+    def test_fused_branch(self):
+        """run() fuses SUB/JNZ but counts and stops per instruction."""
+        self.vm.load_program_string("MVR i:3, 4\nloop:\nSUB 4, i:1\nMVR 0, 4\n"
+                                    "SUB 4, i:0\nJNZ loop, 0\nHALT")
+        self.assertEqual(self.cpu._fused_program[3].count, 2)
+        self.assertIs(self.cpu.decoded_program[3].fused, None)
+        
+        # Stop between the two halves of the fused pair
+        self.cpu.run(4)
+        self.assertEqual((self.cpu.pc, self.cpu.instruction_count), (4, 4))
+        self.cpu.run()
+        self.assertEqual(self.cpu.state, CPUState.STOPPED)
+        self.assertEqual(self.cpu.registers[4], 0)
+        self.assertEqual(self.cpu.instruction_count, 14)
+    
+    def test_run_stops_at_breakpoint(self):
+        """run() stops before a breakpoint and resumes past it."""
+        self.vm.load_program_string("MVR i:2, 4\nloop:\nSUB 4, i:1\nMVR 0, 4\n"
+                                    "SUB 4, i:0\nJNZ loop, 0\nHALT")
+        # Inside a fused SUB/JNZ pair
+        self.cpu.set_breakpoint(4)
+        self.cpu.run()
+        self.assertEqual(self.cpu.state, CPUState.BREAKPOINT)
+        self.assertEqual((self.cpu.pc, self.cpu.instruction_count), (4, 4))
+        
+        self.cpu.run()
+        self.assertEqual(self.cpu.state, CPUState.BREAKPOINT)
+        self.assertEqual((self.cpu.pc, self.cpu.instruction_count), (4, 8))
+        
+        self.cpu.clear_breakpoint(4)
+        self.cpu.run()
+        self.assertEqual(self.cpu.state, CPUState.STOPPED)
+        self.assertEqual(self.cpu.instruction_count, 10)
+    
+    def test_decode_errors_raised_on_execution(self):
+        """A bad operand only fails when its instruction runs."""
+        self.vm.load_program_string("JMP skip\nJMP nowhere\nskip:\nMVR i:3, 4\nHALT")
+        self.run_program()
+        self.assertEqual(self.cpu.state, CPUState.STOPPED)
+        self.assertEqual(self.cpu.registers[4], 3)
+        
+        self.vm.load_program_string("JMP nowhere\nHALT")
+        with self.assertRaises(MemoryException):
+            self.run_program()
+        self.assertEqual(self.cpu.state, CPUState.ERROR)
+    
+    def test_program_replaced_in_memory(self):
+        """Loading a program straight into memory invalidates the decode cache."""
+        self.vm.load_program_string("MVR i:1, 4\nHALT")
+        self.run_program()
+        self.assertEqual(self.cpu.registers[4], 1)
+        
+        instructions, labels = load_assembly_string("MVR i:2, 4\nHALT")
+        self.vm.memory.load_program(instructions, labels)
+        self.cpu.pc = 0
+        self.run_program()
+        self.assertEqual(self.cpu.registers[4], 2)
+    
+    def test_grouped_register_numbers(self):
+        """Register numbers accept the same digit grouping as int()."""
+        self.vm.load_program_string("MVR i:7, 1_0\nHALT")
+        self.run_program()
+        self.assertEqual(self.cpu.registers[10], 7)
+        for operand in ('1__0', '10_', '+_1'):
+            with self.assertRaises(AssemblyLoaderError):
+                load_assembly_string(f"MVR i:7, {operand}")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,146 @@
+"""
+Tests for the MCL debug adapter's message transport.
+"""
+
+import unittest
+import io
+import json
+import os
+import sys
+import tempfile
+import gc
+import weakref
+import asyncio
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.debugger.debug_adapter import MCLDebugAdapter
+from src.vm.virtual_machine import create_vm
+
+
+def frame(message):
+    """Encode a message with its Content-Length header."""
+    body = json.dumps(message).encode('utf-8')
+    return b'Content-Length: %d\r\n\r\n' % len(body) + body
+
+
+REQUESTS = (frame({'type': 'request', 'seq': 1, 'command': 'initialize', 'arguments': {}})
+            + frame({'type': 'request', 'seq': 2, 'command': 'disconnect'}))
+
+
+def parse_output(data):
+    """Decode every framed message written by the adapter."""
+    adapter = MCLDebugAdapter()
+    adapter._rxbuf += data
+    return adapter._parse_messages()
+
+
+class TestDebugAdapterTransport(unittest.TestCase):
+    """Test that the adapter works over generic streams."""
+    
+    def check_responses(self, messages):
+        self.assertEqual([m.get('command') or m.get('event') for m in messages],
+                         ['initialize', 'initialized', 'disconnect'])
+        self.assertTrue(all(m.get('success', True) for m in messages))
+    
+    def test_in_memory_streams(self):
+        """Requests are read from and responses written to BytesIO."""
+        output = io.BytesIO()
+        MCLDebugAdapter(io.BytesIO(REQUESTS), output).run()
+        self.check_responses(parse_output(output.getvalue()))
+    
+    def test_text_streams(self):
+        """Text streams without a binary buffer are supported."""
+        output = io.StringIO()
+        MCLDebugAdapter(io.StringIO(REQUESTS.decode('utf-8')), output).run()
+        self.check_responses(parse_output(output.getvalue().encode('utf-8')))
+    
+    def test_file_streams(self):
+        """Regular files work, not just pipes."""
+        with tempfile.TemporaryDirectory() as tmp:
+            in_path = os.path.join(tmp, 'in')
+            out_path = os.path.join(tmp, 'out')
+            with open(in_path, 'wb') as f:
+                f.write(REQUESTS)
+            with open(in_path, 'rb') as input_stream, open(out_path, 'wb') as output_stream:
+                MCLDebugAdapter(input_stream, output_stream).run()
+            with open(out_path, 'rb') as f:
+                self.check_responses(parse_output(f.read()))
+    
+    def test_end_of_input_stops_adapter(self):
+        """The adapter returns once the input stream is exhausted."""
+        output = io.BytesIO()
+        MCLDebugAdapter(io.BytesIO(REQUESTS[:-10]), output).run()
+        self.assertEqual(parse_output(output.getvalue())[0]['command'], 'initialize')
+
+
+class TestDebugAdapterCaches(unittest.TestCase):
+    """Test that cached lookups belong to a single adapter."""
+    
+    def make_adapter(self, value):
+        adapter = MCLDebugAdapter(io.BytesIO(), io.BytesIO())
+        adapter.vm = create_vm({'enable_gpu': False})
+        adapter.vm.set_register(4, value)
+        return adapter
+    
+    def test_evaluate_cache_per_adapter(self):
+        """Adapters neither share nor clear each other's evaluate results."""
+        first, second = self.make_adapter(1), self.make_adapter(2)
+        self.assertEqual(first._evaluate('r4', 0, 0), '0x00000001 (1)')
+        self.assertEqual(second._evaluate('r4', 0, 0), '0x00000002 (2)')
+        second._evaluate.cache_clear()
+        self.assertEqual(first._evaluate.cache_info().currsize, 1)
+    
+    def test_adapter_released(self):
+        """A discarded adapter is not kept alive by its caches."""
+        adapter = self.make_adapter(1)
+        adapter._evaluate('r4', 0, 0)
+        ref = weakref.ref(adapter)
+        del adapter
+        gc.collect()
+        self.assertIsNone(ref())
+
+
+class TestDebugAdapterContinue(unittest.TestCase):
+    """Test that continue always reports how the run ended."""
+    
+    def setUp(self):
+        self.output = io.BytesIO()
+        self.adapter = MCLDebugAdapter(io.BytesIO(), self.output)
+        self.adapter.vm = create_vm({'enable_gpu': False})
+        self.adapter.vm.set_highspeed_mode(True)
+    
+    def continue_until_stopped(self):
+        async def run():
+            self.adapter._handle_continue(1, {})
+            await asyncio.wait((self.adapter._vm_task,))
+            # Let the done-callback run
+            await asyncio.sleep(0)
+            await self.adapter._flush()
+        asyncio.run(run())
+        return parse_output(self.output.getvalue())
+    
+    def test_continue_runs_to_halt(self):
+        """The VM is resumed and the halt is reported."""
+        self.adapter.vm.load_program_string("MVR i:3, 4\nHALT")
+        messages = self.continue_until_stopped()
+        self.assertEqual(messages[0]['command'], 'continue')
+        self.assertEqual(messages[-1]['event'], 'stopped')
+        self.assertEqual(messages[-1]['body']['reason'], 'exit')
+        self.assertEqual(self.adapter.vm.get_register(4), 3)
+        self.assertFalse(self.adapter.vm.paused)
+    
+    def test_failed_start_is_reported(self):
+        """An exception from vm.start is logged and sent as a stopped event."""
+        with mock.patch.object(self.adapter.vm, 'start', side_effect=RuntimeError('no display')), \
+                self.assertLogs('src.debugger.debug_adapter', 'ERROR'):
+            messages = self.continue_until_stopped()
+        self.assertEqual(messages[-1]['event'], 'stopped')
+        self.assertEqual(messages[-1]['body']['reason'], 'exception')
+        self.assertIn('no display', messages[-1]['body']['text'])
+        self.assertFalse(self.adapter.vm.running)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+"""
+Tests for the interactive debugger's command handling.
+"""
+
+import unittest
+import io
+import sys
+import os
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.debugger.interactive_debugger import MCLDebugger
+from src.vm.virtual_machine import create_vm
+
+
+class TestInteractiveDebuggerParsing(unittest.TestCase):
+    """Test address and value parsing."""
+    
+    def setUp(self):
+        self.debugger = MCLDebugger()
+        self.debugger.console.file = io.StringIO()
+        self.debugger.vm = create_vm({'enable_gpu': False})
+    
+    def test_parse_prefixed_and_decimal(self):
+        """Prefixed literals and plain decimals, including leading zeros, parse."""
+        for text, expected in (('0x1F', 31), ('0X1f', 31), ('0o17', 15), ('0b11', 3),
+                               ('10', 10), ('010', 10), ('007', 7)):
+            with self.subTest(text=text):
+                self.assertEqual(self.debugger._parse_value(text), expected)
+                self.assertEqual(self.debugger._parse_address(text), expected)
+        with self.assertRaises(ValueError):
+            self.debugger._parse_value('0x')
+    
+    def test_leading_zero_commands(self):
+        """memory and set accept decimals with leading zeros."""
+        self.debugger.onecmd('memory 010 2')
+        self.assertEqual(self.debugger.last_dump_address, 10)
+        self.debugger.onecmd('set reg 5 010')
+        self.assertEqual(self.debugger.vm.get_register(5), 10)
+
+
+
+class TestInteractiveDebuggerInput(unittest.TestCase):
+    """Test when scripted input is read up front."""
+    
+    def setUp(self):
+        self.debugger = MCLDebugger()
+        self.debugger.console.file = io.StringIO()
+    
+    def test_regular_file_queued(self):
+        """Commands in a regular file are queued without prompts."""
+        with tempfile.TemporaryFile('w+') as f:
+            f.write('status\nquit\n')
+            f.seek(0)
+            self.debugger.stdin = f
+            self.debugger.preloop()
+        self.assertEqual(self.debugger.cmdqueue, ['status', 'quit'])
+        self.assertEqual(self.debugger.prompt, '')
+    
+    def test_pipe_read_line_by_line(self):
+        """An open pipe is not read to the end, so preloop does not block."""
+        read_fd, write_fd = os.pipe()
+        with os.fdopen(read_fd) as reader, os.fdopen(write_fd, 'w') as writer:
+            writer.write('status\n')
+            writer.flush()
+            self.debugger.stdin = reader
+            self.debugger.preloop()
+        self.assertEqual(self.debugger.cmdqueue, [])
+        self.assertEqual(self.debugger.prompt, MCLDebugger.prompt)
+    
+    def test_stream_without_descriptor(self):
+        """Streams without a file descriptor keep line-by-line reading."""
+        self.debugger.stdin = io.StringIO('status\n')
+        self.debugger.preloop()
+        self.assertEqual(self.debugger.cmdqueue, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
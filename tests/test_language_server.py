@@ -0,0 +1,100 @@
+"""
+Tests for the MCL language server's document handling.
+"""
+
+import unittest
+import asyncio
+import sys
+import os
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from pygls.workspace import Workspace
+from lsprotocol.types import (
+    DocumentDiagnosticParams,
+    FullDocumentDiagnosticReport,
+    HoverParams,
+    Position,
+    Range,
+    TextDocumentContentChangeEvent_Type1,
+    TextDocumentIdentifier,
+    TextDocumentItem,
+    VersionedTextDocumentIdentifier,
+)
+
+from src.language_server.server import mcl_server, hover, diagnostics
+
+
+URI = 'file:///test.mcl'
+
+
+class TestLanguageServerDocuments(unittest.TestCase):
+    """Test that positions follow the client's UTF-16 encoding."""
+    
+    def setUp(self):
+        self.saved_workspace = mcl_server.lsp._workspace
+        self.workspace = Workspace(None)
+        mcl_server.lsp._workspace = self.workspace
+        # An emoji is one code point but two UTF-16 code units
+        self.workspace.put_text_document(TextDocumentItem(
+            uri=URI, language_id='mcl', version=1, text='// \U0001F600 in\nvar x: int;'))
+    
+    def tearDown(self):
+        mcl_server.close_document(URI)
+        mcl_server.lsp._workspace = self.saved_workspace
+    
+    def edit(self, start, end, text):
+        self.workspace.update_text_document(
+            VersionedTextDocumentIdentifier(uri=URI, version=2),
+            TextDocumentContentChangeEvent_Type1(
+                range=Range(start=Position(*start), end=Position(*end)), text=text))
+    
+    def hover_at(self, line, character):
+        params = HoverParams(text_document=TextDocumentIdentifier(uri=URI),
+                             position=Position(line=line, character=character))
+        return asyncio.run(hover(params))
+    
+    def test_edit_after_non_bmp_character(self):
+        """An incremental edit after an emoji lands at the right column."""
+        # 'in' starts at UTF-16 column 6 (code point column 5)
+        self.edit((0, 8), (0, 8), 't')
+        self.assertEqual(mcl_server.get_text(URI), '// \U0001F600 int\nvar x: int;')
+        self.assertEqual(mcl_server.get_lines(URI)[0], '// \U0001F600 int')
+    
+    def test_hover_range_in_client_units(self):
+        """Hover positions and ranges are converted to and from UTF-16."""
+        self.edit((0, 8), (0, 8), 't')
+        result = self.hover_at(0, 7)
+        self.assertIsNotNone(result)
+        self.assertIn('int', result.contents.value)
+        self.assertEqual((result.range.start.character, result.range.end.character), (6, 9))
+    
+    def test_diagnostics_wait_for_edits(self):
+        """Pulls made during a burst of edits share one run on the settled text."""
+        runs = []
+        
+        async def compute(uri, text):
+            runs.append(text)
+            return FullDocumentDiagnosticReport(kind="full", items=[])
+        
+        async def burst():
+            params = DocumentDiagnosticParams(text_document=TextDocumentIdentifier(uri=URI))
+            pulls = []
+            for i in range(3):
+                self.edit((1, 0), (1, 0), 'x')
+                mcl_server.debounce(URI)
+                pulls.append(asyncio.ensure_future(diagnostics(params)))
+                await asyncio.sleep(0)
+            return await asyncio.gather(*pulls)
+        
+        with mock.patch.object(mcl_server, 'CHANGE_DEBOUNCE', 0.01), \
+                mock.patch('src.language_server.server._compute_diagnostics', compute):
+            reports = asyncio.run(burst())
+        self.assertEqual(runs, [mcl_server.get_text(URI)])
+        self.assertTrue(runs[0].endswith('xxxvar x: int;'))
+        self.assertIs(reports[0], reports[2])
+
+
+if __name__ == '__main__':
+    unittest.main()
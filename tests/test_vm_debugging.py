@@ -0,0 +1,74 @@
+"""
+Tests for VirtualMachine debugging helpers (stepping, breakpoints).
+"""
+
+import unittest
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.vm.virtual_machine import create_vm
+from src.vm.cpu import CPUState, CPUException
+from src.vm.assembly_loader import load_assembly_string
+
+
+PROGRAM = "MVR i:7, 4\nMVR i:8, 5\nADD 4, 5\nHALT"
+
+
+class TestVMDebugging(unittest.TestCase):
+    """Test VM debugging helpers."""
+    
+    def setUp(self):
+        self.vm = create_vm({'enable_gpu': False})
+        self.vm.load_program_string(PROGRAM)
+    
+    def test_step_many_executes_count(self):
+        """step_many executes exactly the requested number of instructions."""
+        self.assertEqual(self.vm.step_many(2), 2)
+        self.assertEqual(self.vm.cpu.pc, 2)
+        self.assertEqual(self.vm.get_register(5), 8)
+    
+    def test_step_many_stops_at_halt(self):
+        """step_many stops once the program halts."""
+        self.assertEqual(self.vm.step_many(100), 4)
+        self.assertEqual(self.vm.cpu.state, CPUState.STOPPED)
+        self.assertEqual(self.vm.get_register(0), 15)
+    
+    def test_step_many_stops_at_breakpoint(self):
+        """step_many stops before executing a breakpointed instruction."""
+        self.vm.set_breakpoint(2)
+        self.assertEqual(self.vm.step_many(100), 2)
+        self.assertEqual(self.vm.cpu.state, CPUState.BREAKPOINT)
+        self.assertEqual(self.vm.cpu.pc, 2)
+    
+    def test_state_bytes_round_trip(self):
+        """A binary snapshot restores the registers, PC, counters and state."""
+        self.vm.step_many(2)
+        snapshot = self.vm.cpu.get_state_bytes()
+        self.vm.step_many(100)
+        
+        self.vm.cpu.load_state_bytes(snapshot)
+        self.assertEqual(self.vm.cpu.pc, 2)
+        self.assertEqual(self.vm.cpu.instruction_count, 2)
+        self.assertEqual(self.vm.cpu.state, CPUState.RUNNING)
+        self.assertEqual(self.vm.get_register(0), 0)
+        self.assertEqual(self.vm.get_register(5), 8)
+        
+        with self.assertRaises(CPUException):
+            self.vm.cpu.load_state_bytes(snapshot[:-1])
+    
+    def test_program_dump_cache(self):
+        """Cached program dumps survive caller edits and follow program loads."""
+        dump = self.vm.get_program_dump(0, 2)
+        self.assertEqual([address for address, _ in dump], [0, 1])
+        dump.clear()
+        self.assertEqual(len(self.vm.get_program_dump(0, 2)), 2)
+        
+        instructions, labels = load_assembly_string("HALT")
+        self.vm.memory.load_program(instructions, labels)
+        self.assertEqual(self.vm.get_program_dump(0, 2), [(0, str(instructions[0]))])
+
+
+if __name__ == '__main__':
+    unittest.main()